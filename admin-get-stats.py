@@ -1,16 +1,12 @@
 import json
 import boto3
-from decimal import Decimal
+from scan_engine import parallel_scan
+from http_compression import gzip_response
+from item_codec import json_default
 
 dynamodb = boto3.resource('dynamodb')
 titles_table = dynamodb.Table('GrainTitles')
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, Decimal):
-            return float(o)
-        return super().default(o)
-
 def get_user_info(event):
     """Extract user information from Cognito authorizer claims"""
     try:
@@ -45,6 +41,7 @@ def get_user_info(event):
         print(f"Error extracting user info: {str(e)}")
         return None
 
+@gzip_response()
 def lambda_handler(event, context):
     try:
         # Check if this is a public/guest request (no auth required for read-only stats)
@@ -88,14 +85,8 @@ def lambda_handler(event, context):
         else:
             print("Public guest access for statistics")
         
-        # Scan all titles to get statistics
-        response = titles_table.scan()
-        all_titles = response['Items']
-        
-        # Handle pagination if there are more items
-        while 'LastEvaluatedKey' in response:
-            response = titles_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
-            all_titles.extend(response['Items'])
+        # Scan all titles to get statistics (segments run in parallel)
+        all_titles = list(parallel_scan(titles_table.name))
         
         # Calculate statistics
         total_titles = len(all_titles)
@@ -163,7 +154,7 @@ def lambda_handler(event, context):
             'timestamp': event.get('requestContext', {}).get('requestTimeEpoch', 0)
         }
         
-        print(f"Statistics generated: {json.dumps(stats, cls=DecimalEncoder)}")
+        print(f"Statistics generated: {json.dumps(stats, default=json_default)}")
         
         return {
             'statusCode': 200,
@@ -173,7 +164,7 @@ def lambda_handler(event, context):
                 'Access-Control-Allow-Headers': 'Content-Type,Authorization',
                 'Access-Control-Allow-Methods': 'OPTIONS,GET'
             },
-            'body': json.dumps(stats, cls=DecimalEncoder)
+            'body': json.dumps(stats, default=json_default)
         }
         
     except Exception as e:
@@ -0,0 +1,83 @@
+"""Create the hash lookup indexes on GrainTitles and backfill CurrentHash.
+
+grainApp-validate-hash.py resolves a pasted hash through two KEYS_ONLY GSIs:
+CurrentHashIndex (partition CurrentHash) and FinalTitleHashIndex (partition
+FinalTitleHash, sparse: only issued titles carry it). DynamoDB indexes
+existing items itself once a GSI is created, but early records were written
+without CurrentHash, so this script copies TitleHash into it where missing.
+
+Indexes are created one at a time (DynamoDB allows one GSI creation per
+update_table call) and the script waits for each to become ACTIVE.
+
+Usage: python backfill_hash_indexes.py [--dry-run]
+"""
+import sys
+import time
+from botocore.exceptions import ClientError
+from scan_engine import parallel_scan
+from item_codec import client
+from chain_heads import titles_table
+
+HASH_INDEXES = [
+    ('CurrentHashIndex', 'CurrentHash'),
+    ('FinalTitleHashIndex', 'FinalTitleHash')
+]
+
+def index_status(index_name):
+    table = client.describe_table(TableName=titles_table.name)['Table']
+    for index in table.get('GlobalSecondaryIndexes', []):
+        if index['IndexName'] == index_name:
+            return index['IndexStatus']
+    return None
+
+def ensure_index(index_name, attribute, dry_run=False):
+    status = index_status(index_name)
+    if status is None:
+        print(f"{'Would create' if dry_run else 'Creating'} {index_name} on {attribute}")
+        if dry_run:
+            return
+        client.update_table(
+            TableName=titles_table.name,
+            AttributeDefinitions=[{'AttributeName': attribute, 'AttributeType': 'S'}],
+            GlobalSecondaryIndexUpdates=[{
+                'Create': {
+                    'IndexName': index_name,
+                    'KeySchema': [{'AttributeName': attribute, 'KeyType': 'HASH'}],
+                    'Projection': {'ProjectionType': 'KEYS_ONLY'}
+                }
+            }]
+        )
+        status = index_status(index_name)
+    while status not in ('ACTIVE', None):
+        print(f"{index_name} is {status}, waiting...")
+        time.sleep(15)
+        status = index_status(index_name)
+    print(f"{index_name} is ACTIVE")
+
+def backfill_current_hash(dry_run=False):
+    updated = 0
+    for item in parallel_scan(titles_table.name,
+                              ProjectionExpression='TitleHash',
+                              FilterExpression='attribute_not_exists(CurrentHash)'):
+        updated += 1
+        if dry_run:
+            continue
+        try:
+            titles_table.update_item(
+                Key={'TitleHash': item['TitleHash']},
+                UpdateExpression='SET CurrentHash = :hash',
+                ConditionExpression='attribute_not_exists(CurrentHash)',
+                ExpressionAttributeValues={':hash': item['TitleHash']}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            updated -= 1
+    print(f"{'Would backfill' if dry_run else 'Backfilled'} CurrentHash on {updated} records")
+    return updated
+
+if __name__ == '__main__':
+    dry_run = '--dry-run' in sys.argv
+    for index_name, attribute in HASH_INDEXES:
+        ensure_index(index_name, attribute, dry_run)
+    backfill_current_hash(dry_run)
@@ -0,0 +1,190 @@
+"""Nightly integrity audit of every chain in GrainTitles.
+
+Streams the whole table (parallel scan, hash fields only), groups records
+into chains by InitialHash and re-verifies each chain on a process pool:
+every record's CurrentHash is re-computed with title_hashing (the formulas
+grainApp-validate-hash.py uses), every PreviousHash must point at a record of
+the same chain one TransferCount lower, and the genesis record must carry
+the InitialHash. Chains with problems go into a JSON report written to S3
+(s3://bucket/key) or a local path.
+
+SHA-256 over short strings is CPU bound, so chains are hashed in worker
+processes rather than threads. Lambda has no /dev/shm for multiprocessing;
+run the job from a container or instance, or pass --workers 1.
+
+Usage:
+  python chain_audit.py [--workers N] [--output s3://bucket/key | path]
+  python chain_audit.py --benchmark [--synthetic CHAINS]
+"""
+import os
+import json
+import time
+import random
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import boto3
+from scan_engine import parallel_scan
+from title_hashing import HASH_FIELDS, compute_hash, hash_matches
+
+# Records per task handed to a worker; large enough to amortise pickling
+AUDIT_CHUNK_RECORDS = 5000
+DEFAULT_OUTPUT = 'chain_audit_report.json'
+
+def load_chains():
+    """InitialHash -> list of records, streamed from a parallel scan"""
+    chains = {}
+    scan_kwargs = {
+        'ProjectionExpression': ', '.join(f'#h{i}' for i in range(len(HASH_FIELDS))),
+        'ExpressionAttributeNames': {f'#h{i}': name for i, name in enumerate(HASH_FIELDS)}
+    }
+    for record in parallel_scan('GrainTitles', **scan_kwargs):
+        chains.setdefault(record.get('InitialHash') or record['TitleHash'], []).append(record)
+    return chains
+
+def audit_chain(initial_hash, records):
+    """Problems found in one chain, or None if it verifies"""
+    by_hash = {}
+    by_count = {}
+    for record in records:
+        by_hash[record['CurrentHash']] = record
+        by_count.setdefault(int(record.get('TransferCount', 0)), []).append(record['CurrentHash'])
+
+    invalid_hashes = []
+    broken_links = []
+    for record in records:
+        transfer_count = int(record.get('TransferCount', 0))
+        if not hash_matches(record):
+            invalid_hashes.append({'transfer_count': transfer_count, 'hash': record['CurrentHash']})
+        if transfer_count == 0:
+            if record['CurrentHash'] != initial_hash:
+                broken_links.append({'transfer_count': 0, 'hash': record['CurrentHash'], 'reason': 'genesis hash is not the InitialHash'})
+            continue
+        previous = by_hash.get(record.get('PreviousHash'))
+        if not previous:
+            broken_links.append({'transfer_count': transfer_count, 'hash': record['CurrentHash'], 'reason': 'PreviousHash not in chain'})
+        elif int(previous.get('TransferCount', 0)) != transfer_count - 1:
+            broken_links.append({'transfer_count': transfer_count, 'hash': record['CurrentHash'], 'reason': 'TransferCount gap'})
+
+    forks = sorted(count for count, hashes in by_count.items() if len(hashes) > 1)
+    if 0 not in by_count:
+        broken_links.append({'transfer_count': 0, 'hash': initial_hash, 'reason': 'genesis record missing'})
+    if not (invalid_hashes or broken_links or forks):
+        return None
+    return {
+        'initial_hash': initial_hash,
+        'records': len(records),
+        'invalid_hashes': sorted(invalid_hashes, key=lambda p: p['transfer_count']),
+        'broken_links': sorted(broken_links, key=lambda p: p['transfer_count']),
+        'forks': forks
+    }
+
+def audit_batch(batch):
+    """Worker entry point: audit a list of (initial_hash, records) chains"""
+    return [problem for problem in (audit_chain(h, records) for h, records in batch) if problem]
+
+def chunk_chains(chains, chunk_records=AUDIT_CHUNK_RECORDS):
+    batch = []
+    size = 0
+    for initial_hash, records in chains.items():
+        batch.append((initial_hash, records))
+        size += len(records)
+        if size >= chunk_records:
+            yield batch
+            batch = []
+            size = 0
+    if batch:
+        yield batch
+
+def audit_chains(chains, workers=None):
+    """Problems across all chains, hashed on a pool of worker processes"""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return audit_batch(list(chains.items()))
+    problems = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for found in executor.map(audit_batch, chunk_chains(chains)):
+            problems.extend(found)
+    return problems
+
+def write_report(report, output):
+    body = json.dumps(report, indent=2)
+    if output.startswith('s3://'):
+        bucket, _, key = output[len('s3://'):].partition('/')
+        boto3.client('s3').put_object(Bucket=bucket, Key=key, Body=body.encode(), ContentType='application/json')
+    else:
+        with open(output, 'w') as f:
+            f.write(body)
+    print(f"Report written to {output}")
+
+def run_audit(workers=None, output=DEFAULT_OUTPUT):
+    started = time.perf_counter()
+    chains = load_chains()
+    loaded = time.perf_counter()
+    record_count = sum(len(records) for records in chains.values())
+    problems = audit_chains(chains, workers)
+    finished = time.perf_counter()
+
+    report = {
+        'generated_at': datetime.utcnow().isoformat(),
+        'records': record_count,
+        'chains': len(chains),
+        'invalid_chains': len(problems),
+        'workers': workers or os.cpu_count() or 1,
+        'load_seconds': round(loaded - started, 3),
+        'audit_seconds': round(finished - loaded, 3),
+        'records_per_second': round(record_count / max(finished - loaded, 1e-9)),
+        'problems': problems
+    }
+    print(f"Audited {record_count} records in {len(chains)} chains: {len(problems)} with problems "
+          f"({report['records_per_second']:,} records/s on {report['workers']} workers)")
+    write_report(report, output)
+    return report
+
+def synthetic_chains(count, max_length=40, seed=7):
+    """Valid chains built with the same formulas, for benchmarking without DynamoDB"""
+    rng = random.Random(seed)
+    chains = {}
+    for c in range(count):
+        record = {
+            'GrainType': rng.choice(['Corn', 'Wheat', 'Soybean']),
+            'Quantity': rng.randint(1, 5000),
+            'PriceString': f"{rng.uniform(3, 9):.2f}",
+            'SellerID': f"seller{c}@example.com",
+            'HashTimestamp': f"2024-01-01T00:00:{c % 60:02d}.{c:06d}",
+            'TransferCount': 0,
+            'Status': 'Transferred'
+        }
+        record['CurrentHash'] = record['TitleHash'] = record['InitialHash'] = compute_hash(record)
+        records = [record]
+        for n in range(1, rng.randint(1, max_length)):
+            record = dict(record, PreviousHash=record['CurrentHash'], TransferCount=n,
+                          SellerID=f"buyer{c}-{n}@example.com", HashTimestamp=f"2024-02-01T00:{n % 60:02d}:00.{c:06d}")
+            record['CurrentHash'] = record['TitleHash'] = compute_hash(record)
+            records.append(record)
+        chains[records[0]['InitialHash']] = records
+    return chains
+
+def benchmark(chains):
+    record_count = sum(len(records) for records in chains.values())
+    cpus = os.cpu_count() or 1
+    counts = sorted({1, 2, 4, 8, cpus} & set(range(1, cpus + 1)))
+    baseline = None
+    for workers in counts:
+        started = time.perf_counter()
+        audit_chains(chains, workers)
+        seconds = time.perf_counter() - started
+        baseline = baseline or seconds
+        print(f"{workers:3d} workers: {seconds:8.3f}s  {record_count / seconds:12,.0f} records/s  speedup {baseline / seconds:5.2f}x")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Re-verify every GrainTitles chain')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=os.environ.get('AUDIT_REPORT_OUTPUT', DEFAULT_OUTPUT))
+    parser.add_argument('--benchmark', action='store_true')
+    parser.add_argument('--synthetic', type=int, default=0, help='benchmark on N generated chains instead of the table')
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark(synthetic_chains(args.synthetic) if args.synthetic else load_chains())
+    else:
+        run_audit(args.workers, args.output)
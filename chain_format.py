@@ -0,0 +1,89 @@
+"""Compact chain representation for GrainTitles records.
+
+Records used to carry HashChain, the full list of hashes from the InitialHash
+to themselves, so every transfer rewrote a list one longer than the last.
+New records instead store:
+
+  PreviousHash  - the record this one was derived from (already present)
+  ChainWindow   - the last CHAIN_WINDOW hashes, ending with this record's own
+  ChainDigest   - rolling sha256 accumulator over every hash in the chain
+  ChainLength   - number of records in the chain up to and including this one
+
+The first hash in a window is an anchor: fetching that record yields the
+window before it, so collect_chain_hashes() rebuilds a chain of N links in
+about N / (CHAIN_WINDOW - 1) reads. verify_chain() checks a rebuilt list
+against the digest and length stored on the record.
+
+Records still carrying HashChain are read transparently; run
+migrate_chain_format.py to convert them in place.
+"""
+import hashlib
+
+CHAIN_WINDOW = 16
+
+def _digest(previous_digest, title_hash):
+    return hashlib.sha256(f"{previous_digest}{title_hash}".encode()).hexdigest()
+
+def fold_digest(hashes):
+    """ChainDigest for a chain given as its full list of hashes, oldest first"""
+    digest = ''
+    for title_hash in hashes:
+        digest = _digest(digest, title_hash)
+    return digest
+
+def genesis_fields(initial_hash):
+    """Chain fields for the first record of a new title"""
+    return {
+        'ChainWindow': [initial_hash],
+        'ChainDigest': fold_digest([initial_hash]),
+        'ChainLength': 1
+    }
+
+def chain_window(item):
+    """Most recent hashes known to a record, oldest first, ending with its own"""
+    if 'ChainWindow' in item:
+        return list(item['ChainWindow'])
+    if 'HashChain' in item:
+        return list(item['HashChain'])
+    return [item.get('CurrentHash', item['TitleHash'])]
+
+def link_fields(previous, new_hash):
+    """Chain fields for a record that follows previous"""
+    window = chain_window(previous)
+    if 'ChainDigest' in previous:
+        digest = previous['ChainDigest']
+        length = int(previous['ChainLength'])
+    else:
+        # Legacy record: its HashChain is the whole chain
+        digest = fold_digest(window)
+        length = len(window)
+    return {
+        'ChainWindow': (window + [new_hash])[-CHAIN_WINDOW:],
+        'ChainDigest': _digest(digest, new_hash),
+        'ChainLength': length + 1
+    }
+
+def collect_chain_hashes(item, fetch):
+    """Full list of hashes from the InitialHash to item, oldest first.
+
+    fetch(title_hash) must return that GrainTitles record or None.
+    """
+    hashes = chain_window(item)
+    initial_hash = item.get('InitialHash', hashes[0])
+    while hashes[0] != initial_hash:
+        anchor = fetch(hashes[0])
+        if not anchor:
+            raise LookupError(f"Chain record {hashes[0]} not found")
+        prior = chain_window(anchor)
+        if prior[-1] != hashes[0] or len(prior) < 2:
+            raise ValueError(f"Chain window of {hashes[0]} does not link back")
+        hashes = prior[:-1] + hashes
+    return hashes
+
+def verify_chain(item, hashes):
+    """True if hashes is consistent with item's stored digest and length"""
+    if hashes[-1:] != chain_window(item)[-1:]:
+        return False
+    if 'ChainDigest' not in item:
+        return hashes == list(item.get('HashChain', hashes))
+    return len(hashes) == int(item['ChainLength']) and fold_digest(hashes) == item['ChainDigest']
@@ -0,0 +1,209 @@
+"""Chain head projection for GrainTitles.
+
+Every title is a chain of records sharing an InitialHash. The GrainChainHeads
+table keeps exactly one item per chain: a copy of the record with the highest
+TransferCount. Write handlers call record_chain_head() after they store a new
+link, and listing handlers read the heads table instead of scanning and
+grouping the full GrainTitles history.
+
+Set CHAIN_HEAD_SOURCE=scan to derive heads from GrainTitles on the fly
+instead (e.g. while the projection is being backfilled). That path streams
+scan pages through reduce_chain_heads(), so memory stays O(chains).
+
+Heads carry OwnerKey, the lower-cased SellerID. The OwnerIndex GSI
+(partition OwnerKey, sort TransferCount) turns "titles I own" into a query.
+
+Every head change also bumps a monotonic version counter in GrainAppMeta so
+readers can cache listings per version and answer conditional GETs.
+
+Tables: GrainChainHeads (partition key InitialHash, string; GSI OwnerIndex)
+and GrainAppMeta (partition key MetaKey, string).
+Package this module alongside any Lambda that imports it.
+"""
+import os
+import operator
+from decimal import Decimal
+import boto3
+from botocore.exceptions import ClientError
+from scan_engine import parallel_scan
+from projections import projection_kwargs
+from item_codec import query_items, serialize_values
+
+dynamodb = boto3.resource('dynamodb')
+titles_table = dynamodb.Table('GrainTitles')
+heads_table = dynamodb.Table(os.environ.get('CHAIN_HEADS_TABLE', 'GrainChainHeads'))
+meta_table = dynamodb.Table(os.environ.get('APP_META_TABLE', 'GrainAppMeta'))
+CHAIN_HEAD_SOURCE = os.environ.get('CHAIN_HEAD_SOURCE', 'projection')
+OWNER_INDEX = 'OwnerIndex'
+VERSION_KEY = 'GrainTitles'
+HEAD_CONDITION = 'attribute_not_exists(InitialHash) OR TransferCount <= :tc'
+
+def get_table_version():
+    """Current listing version; changes whenever any chain head changes"""
+    response = meta_table.get_item(Key={'MetaKey': VERSION_KEY}, ConsistentRead=True)
+    return int(response.get('Item', {}).get('Version', 0))
+
+def bump_table_version():
+    response = meta_table.update_item(
+        Key={'MetaKey': VERSION_KEY},
+        UpdateExpression='ADD Version :one',
+        ExpressionAttributeValues={':one': 1},
+        ReturnValues='UPDATED_NEW'
+    )
+    return int(response['Attributes']['Version'])
+
+def try_bump_table_version():
+    """bump_table_version() for writers whose write has already committed.
+
+    The Version item is hot under load; a throttled bump only delays cache
+    invalidation until the next one, so it is logged rather than failing a
+    request that has already written.
+    """
+    try:
+        return bump_table_version()
+    except ClientError as e:
+        print(f"WARNING: listing version bump failed: {str(e)}")
+        return None
+
+def head_item(item):
+    """Chain head copy of a GrainTitles record, with its InitialHash and OwnerKey set"""
+    head = dict(item)
+    head['InitialHash'] = item.get('InitialHash') or item['TitleHash']
+    if item.get('SellerID'):
+        head['OwnerKey'] = item['SellerID'].lower()
+    return head
+
+def chain_head_put(item):
+    """TransactWriteItems Put for item's head, for writers that commit it with the link"""
+    head = head_item(item)
+    return {
+        'Put': {
+            'TableName': heads_table.name,
+            'Item': serialize_values(head),
+            'ConditionExpression': HEAD_CONDITION,
+            'ExpressionAttributeValues': serialize_values({':tc': head.get('TransferCount', 0)})
+        }
+    }
+
+def record_chain_head(item, bump=True):
+    """Store item as its chain's head unless a later link is already recorded.
+
+    Pass bump=False when writing many heads and call bump_table_version()
+    once afterwards. Callers have already stored the link, so a failed head
+    write or version bump is logged instead of raised.
+    """
+    head = head_item(item)
+    try:
+        heads_table.put_item(
+            Item=head,
+            ConditionExpression=HEAD_CONDITION,
+            ExpressionAttributeValues={':tc': head.get('TransferCount', 0)}
+        )
+    except heads_table.meta.client.exceptions.ConditionalCheckFailedException:
+        print(f"Chain head for {head['InitialHash']} is already past transfer #{head.get('TransferCount', 0)}")
+        return False
+    except ClientError as e:
+        # The link itself is stored; backfill_chain_heads() repairs the projection
+        print(f"WARNING: chain head for {head['InitialHash']} not recorded: {str(e)}")
+        return False
+    if bump:
+        try_bump_table_version()
+    return True
+
+def reduce_chain_heads(pages):
+    """Keep only the highest-TransferCount record per InitialHash.
+
+    Single pass, no per-chain sort; on ties the first record seen wins.
+    """
+    heads = {}
+    for page in pages:
+        for item in page:
+            initial_hash = item.get('InitialHash', item.get('TitleHash'))
+            current = heads.get(initial_hash)
+            if current is None or int(item.get('TransferCount', 0)) > int(current.get('TransferCount', 0)):
+                heads[initial_hash] = item
+    return heads
+
+_CONDITION_OPS = {
+    '=': operator.eq,
+    '>=': operator.ge,
+    '<=': operator.le
+}
+
+def matches_conditions(item, conditions):
+    """Evaluate load_chain_heads() conditions against an item in memory"""
+    for attr, op, value in conditions:
+        if attr not in item:
+            return False
+        actual = item[attr]
+        # Native floats from item_codec must compare exactly against Decimal bounds
+        if isinstance(value, Decimal) and isinstance(actual, (int, float)):
+            actual = Decimal(str(actual))
+        if not _CONDITION_OPS[op](actual, value):
+            return False
+    return True
+
+def load_chain_heads(status=None, conditions=(), view=None):
+    """Yield chain heads, optionally only those with the given Status.
+
+    conditions is a sequence of (attribute, op, value) tuples with op one of
+    '=', '>=' or '<='. They are pushed into the scan's FilterExpression when
+    reading the projection. view names a projections.VIEWS entry to limit
+    the attributes returned.
+    """
+    conditions = list(conditions)
+    if status is not None:
+        conditions.insert(0, ('Status', '=', status))
+
+    if CHAIN_HEAD_SOURCE == 'scan':
+        scan_kwargs = projection_kwargs(view, ConsistentRead=True) if view else {'ConsistentRead': True}
+        heads = reduce_chain_heads(parallel_scan(titles_table.name, **scan_kwargs).pages())
+        for head in heads.values():
+            if matches_conditions(head, conditions):
+                yield head
+        return
+
+    scan_kwargs = {'ConsistentRead': True}
+    if conditions:
+        scan_kwargs.update(
+            FilterExpression=' AND '.join(
+                f'#a{i} {op} :v{i}' for i, (attr, op, value) in enumerate(conditions)
+            ),
+            ExpressionAttributeNames={f'#a{i}': attr for i, (attr, op, value) in enumerate(conditions)},
+            ExpressionAttributeValues={f':v{i}': value for i, (attr, op, value) in enumerate(conditions)}
+        )
+    if view:
+        scan_kwargs = projection_kwargs(view, **scan_kwargs)
+    yield from parallel_scan(heads_table.name, **scan_kwargs)
+
+def load_owner_heads(owner, view=None):
+    """Yield the chain heads currently owned by owner (case-insensitive)"""
+    owner_key = owner.lower()
+    if CHAIN_HEAD_SOURCE == 'scan':
+        scan_kwargs = projection_kwargs(view, ConsistentRead=True) if view else {'ConsistentRead': True}
+        heads = reduce_chain_heads(parallel_scan(titles_table.name, **scan_kwargs).pages())
+        for head in heads.values():
+            if (head.get('SellerID') or '').lower() == owner_key:
+                yield head
+        return
+
+    query_kwargs = {
+        'IndexName': OWNER_INDEX,
+        'KeyConditionExpression': 'OwnerKey = :owner',
+        'ExpressionAttributeValues': {':owner': owner_key}
+    }
+    if view:
+        query_kwargs = projection_kwargs(view, **query_kwargs)
+    yield from query_items(heads_table.name, **query_kwargs)
+
+def backfill_chain_heads():
+    """Rebuild the projection from the full GrainTitles history"""
+    # Decimal items, since they are written back through the resource layer
+    heads = reduce_chain_heads(parallel_scan(titles_table.name, native=False, ConsistentRead=True).pages())
+    written = sum(1 for head in heads.values() if record_chain_head(head, bump=False))
+    bump_table_version()
+    print(f"Backfilled {written} of {len(heads)} chain heads")
+    return written
+
+if __name__ == '__main__':
+    backfill_chain_heads()
@@ -1,16 +1,7 @@
 import json
-import boto3
-from decimal import Decimal
-from collections import defaultdict
-
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('GrainTitles')
-
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, Decimal):
-            return float(o)
-        return super().default(o)
+from chain_heads import load_owner_heads
+from http_compression import gzip_response
+from item_codec import json_default
 
 def get_user_info(event):
     try:
@@ -38,6 +29,7 @@ def get_user_info(event):
         print(f"Error extracting user info: {str(e)}")
         return None
 
+@gzip_response()
 def lambda_handler(event, context):
     try:
         user_info = get_user_info(event)
@@ -56,34 +48,8 @@ def lambda_handler(event, context):
         user_email = user_info['email'].lower()
         print(f"Loading titles for user: {user_email}")
         
-        # Scan entire table with consistent read
-        response = table.scan(ConsistentRead=True)
-        all_items = response.get('Items', [])
-        while 'LastEvaluatedKey' in response:
-            response = table.scan(
-                ExclusiveStartKey=response['LastEvaluatedKey'],
-                ConsistentRead=True
-            )
-            all_items.extend(response.get('Items', []))
-        
-        print(f"Total records: {len(all_items)}")
-        
-        # Group by InitialHash
-        chains = defaultdict(list)
-        for item in all_items:
-            initial_hash = item.get('InitialHash', item.get('TitleHash'))
-            chains[initial_hash].append(item)
-        
-        # Find chain heads owned by user
-        my_titles = []
-        for initial_hash, records in chains.items():
-            # Sort by TransferCount DESC to get head
-            records.sort(key=lambda x: int(x.get('TransferCount', 0)), reverse=True)
-            head = records[0]
-            
-            seller_id = (head.get('SellerID') or '').lower()
-            if seller_id == user_email:
-                my_titles.append(head)
+        # Query the owner index on the chain head projection
+        my_titles = list(load_owner_heads(user_email, view='listing'))
         
         print(f"User owns {len(my_titles)} chain heads")
         
@@ -99,7 +65,7 @@ def lambda_handler(event, context):
                 'items': my_titles,
                 'count': len(my_titles),
                 'user_email': user_email
-            }, cls=DecimalEncoder)
+            }, default=json_default)
         }
         
     except Exception as e:
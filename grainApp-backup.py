@@ -1,10 +1,9 @@
 import json,boto3,os
 from datetime import datetime
-from decimal import Decimal
-class DE(json.JSONEncoder):
-    def default(self,o):return float(o)if isinstance(o,Decimal)else super().default(o)
+from scan_engine import parallel_scan
+from item_codec import json_default
 def handler(e,c):
-    i=boto3.resource('dynamodb').Table('GrainTitles').scan().get('Items',[])
+    i=list(parallel_scan('GrainTitles'))
     f=f"backup-{datetime.now().strftime('%Y%m%d')}.json"
-    boto3.client('s3').put_object(Bucket=os.environ['BUCKET'],Key=f,Body=json.dumps(i,cls=DE).encode())
+    boto3.client('s3').put_object(Bucket=os.environ['BUCKET'],Key=f,Body=json.dumps(i,default=json_default).encode())
     return{'statusCode':200,'body':f'Backed up {len(i)} items'}
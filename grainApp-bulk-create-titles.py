@@ -0,0 +1,259 @@
+import io
+import csv
+import json
+import time
+import base64
+import hashlib
+from datetime import datetime, timedelta
+from decimal import Decimal
+from botocore.exceptions import ClientError
+from chain_heads import titles_table, heads_table, head_item, try_bump_table_version
+from chain_format import genesis_fields
+from idempotency import idempotent
+
+MAX_BULK_TITLES = 1000
+
+HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
+    'Access-Control-Allow-Methods': 'OPTIONS,POST'
+}
+
+def get_user_info(event):
+    """Extract user information from Cognito authorizer claims"""
+    try:
+        claims = event.get('requestContext', {}).get('authorizer', {}).get('claims', {})
+
+        if not claims:
+            print("WARNING: No Cognito claims found in request")
+            return None
+
+        email = claims.get('email', 'unknown@example.com')
+        username = claims.get('cognito:username', 'unknown')
+        user_sub = claims.get('sub', '')
+
+        groups_claim = claims.get('cognito:groups', '')
+        if isinstance(groups_claim, str):
+            groups = [g.strip() for g in groups_claim.split(',')] if groups_claim else []
+        else:
+            groups = groups_claim if isinstance(groups_claim, list) else []
+
+        is_admin = 'Admin' in groups or 'Admins' in groups
+        role = 'Admin' if is_admin else 'User'
+
+        return {
+            'email': email,
+            'username': username,
+            'sub': user_sub,
+            'groups': groups,
+            'role': role,
+            'is_admin': is_admin
+        }
+
+    except Exception as e:
+        print(f"Error extracting user info: {str(e)}")
+        return None
+
+def parse_rows(event):
+    """Rows from a JSON array ({"titles": [...]} or a bare list) or a CSV body with a header line"""
+    raw = event.get('body', '')
+    if event.get('isBase64Encoded') and isinstance(raw, str):
+        raw = base64.b64decode(raw).decode('utf-8')
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    content_type = headers.get('content-type', '')
+
+    if isinstance(raw, str) and ('csv' in content_type or not raw.lstrip().startswith(('[', '{'))):
+        return list(csv.DictReader(io.StringIO(raw.strip())))
+
+    body = json.loads(raw) if isinstance(raw, str) else raw
+    if isinstance(body, dict):
+        if isinstance(body.get('csv'), str):
+            return list(csv.DictReader(io.StringIO(body['csv'].strip())))
+        body = body.get('titles')
+    if not isinstance(body, list):
+        raise ValueError('Body must be a JSON array of titles, {"titles": [...]} or CSV')
+    return body
+
+def _field(row, name):
+    # Same aliases as grainApp-create-title.py, plus CSV headers in any case
+    value = row.get(name)
+    if value in (None, ''):
+        camel = ''.join(part.capitalize() for part in name.split('_'))
+        value = row.get(camel)
+    if value in (None, ''):
+        value = next((v for k, v in row.items() if k and k.strip().lower() == name), None)
+    return value.strip() if isinstance(value, str) else value
+
+def validate_rows(rows):
+    """Validate and normalize every row in one pass; returns (titles, errors)"""
+    titles = []
+    errors = []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({'row': index, 'error': 'Row must be an object'})
+            continue
+        grain_type = _field(row, 'grain_type')
+        quantity = _field(row, 'quantity')
+        price = _field(row, 'price')
+        if not grain_type:
+            errors.append({'row': index, 'error': 'Missing grain_type'})
+            continue
+        try:
+            quantity_int = int(quantity)
+            if quantity_int <= 0:
+                raise ValueError("Quantity must be positive")
+        except (ValueError, TypeError) as e:
+            errors.append({'row': index, 'error': f'Invalid quantity: {str(e)}'})
+            continue
+        try:
+            price_float = float(price)
+            if price_float <= 0:
+                raise ValueError("Price must be positive")
+        except (ValueError, TypeError) as e:
+            errors.append({'row': index, 'error': f'Invalid price: {str(e)}'})
+            continue
+        # Normalize price to 2 decimal places for consistent hashing
+        titles.append((grain_type, quantity_int, f"{price_float:.2f}"))
+    return titles, errors
+
+def build_items(titles, user_info):
+    """GrainTitles records for validated rows, hashed exactly as grainApp-create-title.py does.
+
+    Rows get consecutive microsecond timestamps so identical tickets in one
+    batch still hash to distinct titles.
+    """
+    seller_id = user_info['email']
+    started = datetime.utcnow()
+    timestamp = int(started.timestamp())
+    items = []
+    for offset, (grain_type, quantity_int, price_normalized) in enumerate(titles):
+        timestamp_iso = (started + timedelta(microseconds=offset)).isoformat()
+        hash_input = f"{grain_type}{quantity_int}{seller_id}{price_normalized}{timestamp_iso}"
+        initial_hash = hashlib.sha256(hash_input.encode()).hexdigest()
+        items.append({
+            'TitleHash': initial_hash,
+            'SellerID': seller_id,
+            'SellerName': user_info['username'],
+            'SellerSub': user_info['sub'],
+            'BuyerID': 'NONE',
+            'BuyerName': 'NONE',
+            'BuyerSub': 'NONE',
+            'GrainType': grain_type,
+            'Quantity': quantity_int,
+            'Price': Decimal(price_normalized),
+            'PriceString': price_normalized,
+            'Status': 'ForSale',
+            'Timestamp': timestamp,
+            'TimestampISO': timestamp_iso,
+            'HashTimestamp': timestamp_iso,
+            'InitialHash': initial_hash,
+            'CurrentHash': initial_hash,
+            'PreviousHash': initial_hash,
+            'TransferCount': 0,
+            'CreatedBy': seller_id,
+            'CreatedByUsername': user_info['username'],
+            'CreatedBySub': user_info['sub'],
+            **genesis_fields(initial_hash)
+        })
+    return items
+
+def write_items(items):
+    """Write records and their chain heads in BatchWriteItem calls of 25.
+
+    batch_writer re-queues UnprocessedItems until every put is accepted. The
+    heads are new chains, so they need none of record_chain_head()'s
+    conditions; the listing version is bumped once for the batch. Once the
+    titles are stored, head and version failures are logged rather than
+    raised, so the caller is not told to retry a batch that was created.
+    """
+    with titles_table.batch_writer() as batch:
+        for item in items:
+            batch.put_item(Item=item)
+    try:
+        with heads_table.batch_writer() as batch:
+            for item in items:
+                batch.put_item(Item=head_item(item))
+    except ClientError as e:
+        # The titles are stored; backfill_chain_heads() repairs the projection
+        print(f"WARNING: chain heads for {len(items)} bulk titles not all recorded: {str(e)}")
+    try_bump_table_version()
+
+@idempotent('bulk-create-titles')
+def lambda_handler(event, context):
+    """Create many ForSale titles for the caller from a JSON array or CSV of grain_type, quantity, price"""
+    try:
+        # Extract user information - REQUIRED
+        user_info = get_user_info(event)
+        if not user_info:
+            return {
+                'statusCode': 401,
+                'headers': HEADERS,
+                'body': json.dumps({'error': 'Unauthorized: Could not extract user information'})
+            }
+
+        try:
+            rows = parse_rows(event)
+        except (ValueError, csv.Error) as e:
+            return {
+                'statusCode': 400,
+                'headers': HEADERS,
+                'body': json.dumps({'error': f'Could not parse titles: {str(e)}'})
+            }
+
+        if not rows:
+            return {
+                'statusCode': 400,
+                'headers': HEADERS,
+                'body': json.dumps({'error': 'No titles to create'})
+            }
+        if len(rows) > MAX_BULK_TITLES:
+            return {
+                'statusCode': 400,
+                'headers': HEADERS,
+                'body': json.dumps({'error': f'At most {MAX_BULK_TITLES} titles per request'})
+            }
+
+        started = time.perf_counter()
+        titles, errors = validate_rows(rows)
+        if errors:
+            # All or nothing, so a resubmitted batch never duplicates the good rows
+            return {
+                'statusCode': 400,
+                'headers': HEADERS,
+                'body': json.dumps({
+                    'error': f'{len(errors)} of {len(rows)} rows are invalid; nothing was created',
+                    'errors': errors
+                })
+            }
+
+        items = build_items(titles, user_info)
+        write_items(items)
+        elapsed = time.perf_counter() - started
+        rate = len(items) / elapsed if elapsed > 0 else 0.0
+        print(f"Bulk created {len(items)} titles for {user_info['email']} in {elapsed * 1000:.1f} ms ({rate:.0f} titles/s)")
+
+        return {
+            'statusCode': 200,
+            'headers': HEADERS,
+            'body': json.dumps({
+                'message': f'{len(items)} titles created successfully',
+                'created': len(items),
+                'hashes': [item['TitleHash'] for item in items],
+                'seller_id': user_info['email'],
+                'created_by': user_info['email'],
+                'elapsed_ms': round(elapsed * 1000, 1),
+                'titles_per_second': round(rate, 1)
+            })
+        }
+
+    except Exception as e:
+        print(f"ERROR in bulk create: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {
+            'statusCode': 500,
+            'headers': HEADERS,
+            'body': json.dumps({'error': str(e), 'type': type(e).__name__})
+        }
+
+handler = lambda_handler
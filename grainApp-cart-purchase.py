@@ -0,0 +1,150 @@
+import json
+from title_transfer import commit_transfer_batch, TransferConflict
+from item_codec import batch_get_items, json_default
+
+MAX_CART_SIZE = 50
+
+HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+    'Access-Control-Allow-Methods': 'OPTIONS,POST'
+}
+
+def get_user_info(event):
+    """Extract user information from Cognito authorizer claims"""
+    try:
+        claims = event.get('requestContext', {}).get('authorizer', {}).get('claims', {})
+        
+        if not claims:
+            print("WARNING: No Cognito claims found in request")
+            return None
+        
+        email = claims.get('email', 'unknown@example.com')
+        username = claims.get('cognito:username', 'unknown')
+        user_sub = claims.get('sub', '')
+        
+        groups_claim = claims.get('cognito:groups', '')
+        if isinstance(groups_claim, str):
+            groups = [g.strip() for g in groups_claim.split(',')] if groups_claim else []
+        else:
+            groups = groups_claim if isinstance(groups_claim, list) else []
+        
+        is_admin = 'Admin' in groups or 'Admins' in groups
+        role = 'Admin' if is_admin else 'User'
+        
+        return {
+            'email': email,
+            'username': username,
+            'sub': user_sub,
+            'groups': groups,
+            'role': role,
+            'is_admin': is_admin
+        }
+        
+    except Exception as e:
+        print(f"Error extracting user info: {str(e)}")
+        return None
+
+def lambda_handler(event, context):
+    """Buy several titles in one request; returns an outcome per title"""
+    try:
+        # Extract user information - REQUIRED
+        user_info = get_user_info(event)
+        if not user_info:
+            return {
+                'statusCode': 401,
+                'headers': HEADERS,
+                'body': json.dumps({'error': 'Unauthorized: Could not extract user information'})
+            }
+        
+        if isinstance(event.get('body'), str):
+            body = json.loads(event['body'])
+        else:
+            body = event.get('body', event)
+        
+        title_hashes = body.get('title_hashes') or body.get('hashes') or []
+        if (not isinstance(title_hashes, list) or not title_hashes
+                or not all(isinstance(h, str) and h for h in title_hashes)):
+            return {
+                'statusCode': 400,
+                'headers': HEADERS,
+                'body': json.dumps({'error': 'title_hashes must be a non-empty list of title hashes'})
+            }
+        if len(title_hashes) > MAX_CART_SIZE:
+            return {
+                'statusCode': 400,
+                'headers': HEADERS,
+                'body': json.dumps({'error': f'At most {MAX_CART_SIZE} titles per cart'})
+            }
+        
+        buyer_id = user_info['email']
+        buyer_name = user_info['username']
+        buyer_sub = user_info['sub']
+        print(f"Cart purchase of {len(title_hashes)} titles by {buyer_id}")
+        
+        # One batched consistent read for the whole cart
+        unique_hashes = list(dict.fromkeys(title_hashes))
+        titles = batch_get_items('GrainTitles', 'TitleHash', unique_hashes, ConsistentRead=True)
+        
+        outcomes = {}
+        eligible = []
+        for title_hash, title in zip(unique_hashes, titles):
+            if not title:
+                outcomes[title_hash] = {'status': 'not_found', 'error': 'Title not found'}
+            elif title.get('Status') != 'ForSale':
+                outcomes[title_hash] = {'status': 'not_for_sale', 'error': 'Title is not available for purchase'}
+            elif buyer_id.lower() == title.get('SellerID', '').lower():
+                outcomes[title_hash] = {'status': 'own_title', 'error': 'You cannot purchase your own title'}
+            else:
+                eligible.append(title)
+        
+        sellers = {t['TitleHash']: t.get('SellerID', '') for t in eligible}
+        for title_hash, (new_item, error) in commit_transfer_batch(eligible, buyer_id, buyer_name, buyer_sub).items():
+            if new_item:
+                outcomes[title_hash] = {
+                    'status': 'transferred',
+                    'new_hash': new_item['TitleHash'],
+                    'seller_id': sellers[title_hash],
+                    'transfer_count': new_item['TransferCount']
+                }
+            elif isinstance(error, TransferConflict):
+                outcomes[title_hash] = {'status': 'conflict', 'error': str(error)}
+            else:
+                print(f"ERROR transferring {title_hash}: {error}")
+                outcomes[title_hash] = {'status': 'error', 'error': str(error)}
+        
+        results = []
+        seen = set()
+        for title_hash in title_hashes:
+            if title_hash in seen:
+                results.append({'title_hash': title_hash, 'status': 'duplicate', 'error': 'Title is already in this cart'})
+                continue
+            seen.add(title_hash)
+            results.append(dict(outcomes[title_hash], title_hash=title_hash))
+        
+        transferred = sum(1 for r in results if r['status'] == 'transferred')
+        print(f"Cart purchase by {buyer_id}: {transferred} of {len(results)} transferred")
+        
+        return {
+            'statusCode': 200,
+            'headers': HEADERS,
+            'body': json.dumps({
+                'message': f'{transferred} of {len(results)} titles transferred',
+                'buyer_id': buyer_id,
+                'transferred': transferred,
+                'failed': len(results) - transferred,
+                'results': results
+            }, default=json_default)
+        }
+        
+    except Exception as e:
+        print(f"ERROR in cart purchase: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {
+            'statusCode': 500,
+            'headers': HEADERS,
+            'body': json.dumps({'error': str(e), 'type': type(e).__name__})
+        }
+
+handler = lambda_handler
@@ -3,6 +3,9 @@ import boto3
 import hashlib
 from datetime import datetime
 from decimal import Decimal
+from chain_heads import record_chain_head
+from chain_format import genesis_fields
+from idempotency import idempotent
 
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table('GrainTitles')
@@ -46,6 +49,7 @@ def get_user_info(event):
         print(f"Error extracting user info: {str(e)}")
         return None
 
+@idempotent('create-title')
 def handler(event, context):
     try:
         # Extract user information - REQUIRED
@@ -55,7 +59,7 @@ def handler(event, context):
                 'statusCode': 401,
                 'headers': {
                     'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                     'Access-Control-Allow-Methods': 'OPTIONS,POST'
                 },
                 'body': json.dumps({'error': 'Unauthorized: Could not extract user information'})
@@ -86,7 +90,7 @@ def handler(event, context):
                 'statusCode': 400,
                 'headers': {
                     'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                     'Access-Control-Allow-Methods': 'OPTIONS,POST'
                 },
                 'body': json.dumps({'error': 'Missing grain_type'})
@@ -97,7 +101,7 @@ def handler(event, context):
                 'statusCode': 400,
                 'headers': {
                     'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                     'Access-Control-Allow-Methods': 'OPTIONS,POST'
                 },
                 'body': json.dumps({'error': 'Missing quantity'})
@@ -108,7 +112,7 @@ def handler(event, context):
                 'statusCode': 400,
                 'headers': {
                     'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                     'Access-Control-Allow-Methods': 'OPTIONS,POST'
                 },
                 'body': json.dumps({'error': 'Missing price'})
@@ -124,7 +128,7 @@ def handler(event, context):
                 'statusCode': 400,
                 'headers': {
                     'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                     'Access-Control-Allow-Methods': 'OPTIONS,POST'
                 },
                 'body': json.dumps({'error': f'Invalid quantity: {str(e)}'})
@@ -141,7 +145,7 @@ def handler(event, context):
                 'statusCode': 400,
                 'headers': {
                     'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                     'Access-Control-Allow-Methods': 'OPTIONS,POST'
                 },
                 'body': json.dumps({'error': f'Invalid price: {str(e)}'})
@@ -182,22 +186,23 @@ def handler(event, context):
             'CurrentHash': current_hash,
             'PreviousHash': previous_hash,
             'TransferCount': 0,
-            'HashChain': [initial_hash],
             'CreatedBy': user_info['email'],
             'CreatedByUsername': user_info['username'],
-            'CreatedBySub': seller_sub
+            'CreatedBySub': seller_sub,
+            **genesis_fields(initial_hash)
         }
         
         # Save to DynamoDB
         print(f"Saving item to DynamoDB...")
         table.put_item(Item=item)
+        record_chain_head(item)
         print(f"Successfully created title with ID: {current_hash}")
         
         return {
             'statusCode': 200,
             'headers': {
                 'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                 'Access-Control-Allow-Methods': 'OPTIONS,POST'
             },
             'body': json.dumps({
@@ -222,7 +227,7 @@ def handler(event, context):
             'statusCode': 500,
             'headers': {
                 'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                 'Access-Control-Allow-Methods': 'OPTIONS,POST'
             },
             'body': json.dumps({
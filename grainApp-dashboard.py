@@ -1,5 +1,7 @@
 import json
+from http_compression import gzip_response
 
+@gzip_response(static_key='dashboard')
 def handler(event, context):
     return {
         'statusCode': 200,
@@ -68,6 +70,8 @@ def handler(event, context):
         .action-btn:hover:not(:disabled) { transform: translateY(-2px); box-shadow: 0 4px 8px rgba(0,0,0,0.2); }
         .action-btn:disabled { opacity: 0.5; cursor: not-allowed; transform: none; box-shadow: none; }
         .buy-btn { background: #28a745; color: white; }
+        .cart-toggle { display: inline-flex; align-items: center; gap: 6px; font-weight: 600; color: #2c5282; cursor: pointer; }
+        .cart-results td { padding: 6px 10px; border-bottom: 1px solid #eee; font-size: 0.9em; word-break: break-all; }
         .relist-btn { background: #17a2b8; color: white; }
         .user-indicator { background: #e7f3ff; border: 2px solid #007bff; padding: 12px 15px; border-radius: 8px; margin-bottom: 20px; display: flex; align-items: center; gap: 10px; }
         .user-indicator-text { font-weight: 600; color: #0056b3; }
@@ -255,11 +259,80 @@ def handler(event, context):
             });
         }
 
-        function loadSales() {
-            document.getElementById("content").innerHTML = '<div class="loading">Loading marketplace...</div>';
+        var SALES_PAGE_SIZE = 50;
+        var salesGrainFilter = "";
+        var salesRendered = 0;
+        var cart = {};
+        var writeKeys = {};
+
+        // One Idempotency-Key per logical write, reused if the same request is retried
+        function idempotencyKey(scope) {
+            if (!writeKeys[scope]) {
+                writeKeys[scope] = window.crypto && crypto.randomUUID ? crypto.randomUUID() : Date.now() + "-" + Math.random().toString(16).slice(2);
+            }
+            return writeKeys[scope];
+        }
+
+        function renderSaleCard(item, idx) {
+            var html = "";
+            var grainType = item.GrainType || "Unknown";
+            var grainClass = "grain-" + grainType.toLowerCase();
+            var quantity = parseInt(item.Quantity) || 0;
+            var price = parseFloat(item.Price) || 0;
+            var totalValue = quantity * price;
+            var sellerId = item.SellerID || item.SellerId || item.CreatedBy || "";
+            var buyerId = item.BuyerID || "NONE";
+            var status = item.Status || "";
+            var titleHash = item.TitleHash;
+            var currentHash = item.CurrentHash || item.TitleHash;
+            var isOwnListing = !isGuest && (sellerId.toLowerCase() === email.toLowerCase() && status === "ForSale" && buyerId === "NONE");
+            var youOwnThis = !isGuest && (buyerId.toLowerCase() === email.toLowerCase() && status === "Transferred");
+            var validId = "valid-" + idx;
+            var cardClass = isOwnListing ? "own-listing" : (youOwnThis ? "owned-title" : "");
+            var badge = isOwnListing ? '<span class="own-listing-badge">Your Listing</span>' : (youOwnThis ? '<span class="owned-badge">You Own This</span>' : '');
+            html += '<div class="item-card ' + cardClass + '" data-grain="' + grainType + '">';
+            html += '<div class="item-header"><h3>' + sellerId + badge + '</h3>';
+            html += '<span class="validation-status status-checking" id="' + validId + '">Checking...</span></div>';
+            html += '<div class="item-details">';
+            var ownerId = (status === "Transferred") ? buyerId : sellerId;
+            html += '<div class="detail-row"><span class="detail-label">Owner ID</span><span class="detail-value">' + ownerId + '</span></div>';
+            html += '<div class="detail-row"><span class="detail-label">Grain Type</span><span class="detail-value"><span class="grain-badge ' + grainClass + '">' + grainType + '</span></span></div>';
+            html += '<div class="detail-row"><span class="detail-label">Quantity</span><span class="detail-value">' + quantity.toLocaleString() + ' Bushels</span></div>';
+            html += '<div class="detail-row"><span class="detail-label">Price</span><span class="detail-value">$' + price.toFixed(2) + '/bu</span></div>';
+            html += '<div class="detail-row"><span class="detail-label">Total Value</span><span class="detail-value">$' + totalValue.toLocaleString(undefined, {minimumFractionDigits:2}) + '</span></div>';
+            html += '<div class="detail-row"><span class="detail-label">Transfers</span><span class="detail-value">' + (item.TransferCount || 0) + '</span></div>';
+            html += '<div class="detail-row"><span class="detail-label">Status</span><span class="detail-value"><span class="status-badge status-' + status.toLowerCase() + '">' + status + '</span></span></div>';
+            html += '</div>';
+            html += '<div class="hash-info hash-clickable" onclick="showHistoryModal(\'' + titleHash + '\', \'' + grainType + '\')"><div class="hash-label">Title ID:</div><div class="hash-value">' + currentHash + '</div><div class="hash-hint">Click to see complete ownership history</div></div>';
+            html += '<div style="margin-top:15px;">';
+            if (isGuest) {
+                html += '<button class="action-btn buy-btn" disabled title="Sign in to buy">Sign In to Buy</button>';
+            } else if (isOwnListing) {
+                html += '<button class="action-btn buy-btn" disabled>Your Listing</button>';
+            } else if (youOwnThis) {
+                html += '<button class="action-btn buy-btn" disabled>You Own This</button>';
+            } else if (status === "ForSale") {
+                html += '<button class="action-btn buy-btn" onclick="showBuyForm(\'' + titleHash + '\', \'' + grainType + '\', ' + quantity + ', ' + price + ')">Buy This Title</button>';
+                html += '<label class="cart-toggle"><input type="checkbox" onchange="toggleCart(\'' + titleHash + '\', this.checked)"' + (cart[titleHash] ? ' checked' : '') + '> Add to cart</label>';
+            } else {
+                html += '<button class="action-btn buy-btn" disabled>Not For Sale</button>';
+            }
+            html += '</div></div>';
+            return html;
+        }
+
+        function loadSales(cursor) {
+            if (!cursor) {
+                document.getElementById("content").innerHTML = '<div class="loading">Loading marketplace...</div>';
+                salesRendered = 0;
+                cart = {};
+            }
             var endpoint = isGuest ? "/public-sales" : "/sales";
             var headers = isGuest ? {} : { "Authorization": token };
-            fetch(endpoint, { headers: headers })
+            var params = ["limit=" + SALES_PAGE_SIZE];
+            if (salesGrainFilter) { params.push("grain_type=" + encodeURIComponent(salesGrainFilter)); }
+            if (cursor) { params.push("cursor=" + encodeURIComponent(cursor)); }
+            fetch(endpoint + "?" + params.join("&"), { headers: headers })
             .then(function(res) { return res.json(); })
             .then(function(response) {
                 // Handle AWS integration response format (body is a string)
@@ -268,76 +341,78 @@ def handler(event, context):
                 }
                 var data = response.items || response.Items || response;
                 if (!Array.isArray(data)) data = [];
-                if (data.length === 0) {
+                if (data.length === 0 && !cursor && !salesGrainFilter) {
                     document.getElementById("content").innerHTML = '<div class="empty-state"><h3>No Titles for Sale</h3><p>Check back later or list your own.</p></div>';
                     return;
                 }
-                var html = '<div class="filter-bar"><h2>Marketplace - Titles For Sale</h2>';
-                html += '<div><label style="margin-right:10px;font-weight:600;color:#666;">Filter by Grain:</label>';
-                html += '<select class="filter-select" id="grainFilter" onchange="filterByGrain()">';
-                html += '<option value="">All Grain Types</option><option value="Corn">Corn</option><option value="Wheat">Wheat</option><option value="Soybean">Soybean</option><option value="Oats">Oats</option>';
-                html += '</select></div></div>';
-                data.forEach(function(item, idx) {
-                    var grainType = item.GrainType || "Unknown";
-                    var grainClass = "grain-" + grainType.toLowerCase();
-                    var quantity = parseInt(item.Quantity) || 0;
-                    var price = parseFloat(item.Price) || 0;
-                    var totalValue = quantity * price;
-                    var sellerId = item.SellerID || item.SellerId || item.CreatedBy || "";
-                    var buyerId = item.BuyerID || "NONE";
-                    var status = item.Status || "";
-                    var titleHash = item.TitleHash;
-                    var currentHash = item.CurrentHash || item.TitleHash;
-                    var isOwnListing = !isGuest && (sellerId.toLowerCase() === email.toLowerCase() && status === "ForSale" && buyerId === "NONE");
-                    var youOwnThis = !isGuest && (buyerId.toLowerCase() === email.toLowerCase() && status === "Transferred");
-                    var validId = "valid-" + idx;
-                    var cardClass = isOwnListing ? "own-listing" : (youOwnThis ? "owned-title" : "");
-                    var badge = isOwnListing ? '<span class="own-listing-badge">Your Listing</span>' : (youOwnThis ? '<span class="owned-badge">You Own This</span>' : '');
-                    html += '<div class="item-card ' + cardClass + '" data-grain="' + grainType + '">';
-                    html += '<div class="item-header"><h3>' + sellerId + badge + '</h3>';
-                    html += '<span class="validation-status status-checking" id="' + validId + '">Checking...</span></div>';
-                    html += '<div class="item-details">';
-                    var ownerId = (status === "Transferred") ? buyerId : sellerId;
-                    html += '<div class="detail-row"><span class="detail-label">Owner ID</span><span class="detail-value">' + ownerId + '</span></div>';
-                    html += '<div class="detail-row"><span class="detail-label">Grain Type</span><span class="detail-value"><span class="grain-badge ' + grainClass + '">' + grainType + '</span></span></div>';
-                    html += '<div class="detail-row"><span class="detail-label">Quantity</span><span class="detail-value">' + quantity.toLocaleString() + ' Bushels</span></div>';
-                    html += '<div class="detail-row"><span class="detail-label">Price</span><span class="detail-value">$' + price.toFixed(2) + '/bu</span></div>';
-                    html += '<div class="detail-row"><span class="detail-label">Total Value</span><span class="detail-value">$' + totalValue.toLocaleString(undefined, {minimumFractionDigits:2}) + '</span></div>';
-                    html += '<div class="detail-row"><span class="detail-label">Transfers</span><span class="detail-value">' + (item.TransferCount || 0) + '</span></div>';
-                    html += '<div class="detail-row"><span class="detail-label">Status</span><span class="detail-value"><span class="status-badge status-' + status.toLowerCase() + '">' + status + '</span></span></div>';
-                    html += '</div>';
-                    html += '<div class="hash-info hash-clickable" onclick="showHistoryModal(\'' + titleHash + '\', \'' + grainType + '\')"><div class="hash-label">Title ID:</div><div class="hash-value">' + currentHash + '</div><div class="hash-hint">Click to see complete ownership history</div></div>';
-                    html += '<div style="margin-top:15px;">';
-                    if (isGuest) {
-                        html += '<button class="action-btn buy-btn" disabled title="Sign in to buy">Sign In to Buy</button>';
-                    } else if (isOwnListing) {
-                        html += '<button class="action-btn buy-btn" disabled>Your Listing</button>';
-                    } else if (youOwnThis) {
-                        html += '<button class="action-btn buy-btn" disabled>You Own This</button>';
-                    } else if (status === "ForSale") {
-                        html += '<button class="action-btn buy-btn" onclick="showBuyForm(\'' + titleHash + '\', \'' + grainType + '\', ' + quantity + ', ' + price + ')">Buy This Title</button>';
-                    } else {
-                        html += '<button class="action-btn buy-btn" disabled>Not For Sale</button>';
-                    }
-                    html += '</div></div>';
-                });
-                document.getElementById("content").innerHTML = html;
-                data.forEach(function(item, idx) {
+                var cards = "";
+                var first = salesRendered;
+                data.forEach(function(item, i) { cards += renderSaleCard(item, first + i); });
+                salesRendered += data.length;
+                if (!cursor) {
+                    var html = '<div class="filter-bar"><h2>Marketplace - Titles For Sale</h2>';
+                    html += '<div><label style="margin-right:10px;font-weight:600;color:#666;">Filter by Grain:</label>';
+                    html += '<select class="filter-select" id="grainFilter" onchange="filterByGrain()">';
+                    html += '<option value="">All Grain Types</option><option value="Corn">Corn</option><option value="Wheat">Wheat</option><option value="Soybean">Soybean</option><option value="Oats">Oats</option>';
+                    html += '</select><button class="nav-btn btn-success" id="cartBtn" style="display:none;margin-left:15px;" onclick="submitCart()"></button></div></div>';
+                    if (data.length === 0) { cards = '<div class="empty-state"><h3>No ' + salesGrainFilter + ' Titles for Sale</h3><p>Try another grain type.</p></div>'; }
+                    html += '<div id="salesList">' + cards + '</div><div id="salesMore" style="text-align:center;margin-top:20px;"></div>';
+                    document.getElementById("content").innerHTML = html;
+                    document.getElementById("grainFilter").value = salesGrainFilter;
+                } else {
+                    document.getElementById("salesList").insertAdjacentHTML("beforeend", cards);
+                }
+                var more = document.getElementById("salesMore");
+                more.innerHTML = response.next_cursor ? '<button class="nav-btn btn-primary" onclick="loadSales(\'' + response.next_cursor + '\')">Load More</button>' : '';
+                data.forEach(function(item, i) {
                     var currentHash = item.CurrentHash || item.TitleHash;
-                    validateTitle(currentHash, "valid-" + idx);
+                    validateTitle(currentHash, "valid-" + (first + i));
                 });
             })
             .catch(function(err) { document.getElementById("content").innerHTML = '<div class="alert alert-danger">Error: ' + err.message + '</div>'; });
         }
 
+        function updateCartButton() {
+            var count = Object.keys(cart).length;
+            var btn = document.getElementById("cartBtn");
+            if (btn) {
+                btn.disabled = false;
+                btn.style.display = count ? "inline-block" : "none";
+                btn.textContent = "Buy Selected (" + count + ")";
+            }
+        }
+
+        function toggleCart(titleHash, selected) {
+            if (selected) { cart[titleHash] = true; } else { delete cart[titleHash]; }
+            updateCartButton();
+        }
+
+        function submitCart() {
+            if (isGuest) { showGuestPrompt(); return; }
+            var hashes = Object.keys(cart);
+            if (!hashes.length) { return; }
+            var btn = document.getElementById("cartBtn");
+            if (btn) { btn.disabled = true; btn.textContent = 'Processing...'; }
+            fetch("/cart-purchase", { method: "POST", headers: { "Content-Type": "application/json", "Authorization": token }, body: JSON.stringify({ title_hashes: hashes }) })
+            .then(function(res) { return res.json(); })
+            .then(function(result) {
+                if (result.error) { alert("Error: " + result.error); updateCartButton(); return; }
+                cart = {};
+                var html = '<div class="form-container"><div class="alert ' + (result.failed ? 'alert-info' : 'alert-success') + '"><h3>' + result.message + '</h3></div>';
+                html += '<table class="cart-results">';
+                (result.results || []).forEach(function(r) {
+                    html += '<tr><td>' + r.title_hash + '</td><td><strong>' + r.status + '</strong></td><td>' + (r.new_hash ? 'New hash: ' + r.new_hash : (r.error || '')) + '</td></tr>';
+                });
+                html += '</table>';
+                html += '<div class="form-actions"><button class="nav-btn btn-purple" onclick="loadMyTitles()">View My Titles</button><button class="nav-btn btn-primary" onclick="loadSales()">Back to Marketplace</button></div></div>';
+                document.getElementById("content").innerHTML = html;
+            })
+            .catch(function(err) { alert("Error: " + err.message); updateCartButton(); });
+        }
+
         function filterByGrain() {
-            var filter = document.getElementById("grainFilter").value;
-            var cards = document.querySelectorAll(".item-card");
-            cards.forEach(function(card) {
-                var grain = card.getAttribute("data-grain");
-                if (!filter || grain === filter) { card.style.display = "block"; }
-                else { card.style.display = "none"; }
-            });
+            salesGrainFilter = document.getElementById("grainFilter").value;
+            loadSales();
         }
 
         function filterMyTitlesByGrain() {
@@ -433,10 +508,12 @@ def handler(event, context):
             }
             
             var data = { grain_type: document.getElementById("grainType").value, quantity: parseInt(document.getElementById("quantity").value), price: parseFloat(document.getElementById("price").value) };
-            fetch("/titles", { method: "POST", headers: { "Content-Type": "application/json", "Authorization": token }, body: JSON.stringify(data) })
+            var writeScope = "create:" + JSON.stringify(data);
+            fetch("/titles", { method: "POST", headers: { "Content-Type": "application/json", "Authorization": token, "Idempotency-Key": idempotencyKey(writeScope) }, body: JSON.stringify(data) })
             .then(function(res) { return res.json(); })
             .then(function(result) {
                 if (result.error) { alert("Error: " + result.error); if (submitBtn) { submitBtn.disabled = false; submitBtn.textContent = 'List for Sale'; } return; }
+                delete writeKeys[writeScope];
                 var html = '<div class="form-container"><div class="alert alert-success"><h3>Title Listed Successfully!</h3>';
                 html += '<p><strong>Seller:</strong> ' + (result.seller_id || email) + '</p>';
                 html += '<p><strong>Grain:</strong> ' + data.grain_type + '</p>';
@@ -472,10 +549,11 @@ def handler(event, context):
                 btn.textContent = 'Processing...';
             }
             
-            fetch("/transfer-title", { method: "POST", headers: { "Content-Type": "application/json", "Authorization": token }, body: JSON.stringify({ title_hash: titleHash }) })
+            fetch("/transfer-title", { method: "POST", headers: { "Content-Type": "application/json", "Authorization": token, "Idempotency-Key": idempotencyKey("transfer:" + titleHash) }, body: JSON.stringify({ title_hash: titleHash }) })
             .then(function(res) { return res.json(); })
             .then(function(result) {
                 if (result.error) { alert("Error: " + result.error); if (btn) { btn.disabled = false; btn.textContent = 'Confirm Purchase'; } return; }
+                delete writeKeys["transfer:" + titleHash];
                 var html = '<div class="form-container"><div class="alert alert-success"><h3>Title Purchased Successfully!</h3>';
                 html += '<p><strong>Buyer:</strong> ' + (result.buyer_id || email) + '</p>';
                 html += '<p><strong>Previous Owner:</strong> ' + (result.seller_id || "Unknown") + '</p>';
@@ -513,10 +591,12 @@ def handler(event, context):
             }
             
             var data = { title_hash: titleHash, new_price: parseFloat(document.getElementById("newPrice").value) };
-            fetch("/relist-title", { method: "POST", headers: { "Content-Type": "application/json", "Authorization": token }, body: JSON.stringify(data) })
+            var writeScope = "relist:" + JSON.stringify(data);
+            fetch("/relist-title", { method: "POST", headers: { "Content-Type": "application/json", "Authorization": token, "Idempotency-Key": idempotencyKey(writeScope) }, body: JSON.stringify(data) })
             .then(function(res) { return res.json(); })
             .then(function(result) {
                 if (result.error) { alert("Error: " + result.error); if (submitBtn) { submitBtn.disabled = false; submitBtn.textContent = 'List for Sale'; } return; }
+                delete writeKeys[writeScope];
                 var html = '<div class="form-container"><div class="alert alert-success"><h3>Title Listed for Sale!</h3>';
                 html += '<p><strong>New Price:</strong> $' + data.new_price.toFixed(2) + ' per bushel</p></div>';
                 html += '<div class="form-actions"><button class="nav-btn btn-primary" onclick="loadSales()">View Marketplace</button><button class="nav-btn btn-purple" onclick="loadMyTitles()">View My Titles</button></div></div>';
@@ -1,22 +1,76 @@
 import json
+import base64
 import boto3
-from decimal import Decimal
 from datetime import datetime
+from http_compression import gzip_response
+from item_codec import json_default, query_page, batch_get_items
+from chain_heads import heads_table
+from chain_format import collect_chain_hashes
 
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table('GrainTitles')
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, Decimal):
-            return float(o)
-        return super().default(o)
+# GSI on GrainTitles: partition InitialHash (S), sort TransferCount (N), projection ALL
+INITIAL_HASH_INDEX = 'InitialHashIndex'
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
 
+def encode_cursor(last_key, initial_hash):
+    payload = json.dumps({'i': initial_hash, 'k': last_key}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, initial_hash):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        start_key = payload['k']
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if payload.get('i') != initial_hash:
+        raise ValueError('Cursor belongs to a different title')
+    return start_key
+
+def latest_transfer_count(initial_hash):
+    """Highest TransferCount in the chain, read as a single index item"""
+    items, _ = query_page(
+        table.name,
+        1,
+        IndexName=INITIAL_HASH_INDEX,
+        KeyConditionExpression='InitialHash = :initial_hash',
+        ExpressionAttributeValues={':initial_hash': initial_hash},
+        ProjectionExpression='TransferCount',
+        ScanIndexForward=False
+    )
+    return int(items[0].get('TransferCount', 0)) if items else 0
+
+def fetch_chain_anchor(title_hash):
+    response = table.get_item(
+        Key={'TitleHash': title_hash},
+        ProjectionExpression='TitleHash, CurrentHash, InitialHash, ChainWindow, HashChain'
+    )
+    return response.get('Item')
+
+def chain_history_batch(item, initial_hash):
+    """Every record of the chain, oldest first, via BatchGetItem point reads.
+
+    Starts from the chain head so records after the clicked one are included;
+    the hash list comes from HashChain (legacy) or ChainWindow anchors.
+    """
+    head = heads_table.get_item(Key={'InitialHash': initial_hash}).get('Item') or item
+    hashes = collect_chain_hashes(head, fetch_chain_anchor)
+    records = batch_get_items(table.name, 'TitleHash', hashes)
+    missing = [h for h, r in zip(hashes, records) if r is None]
+    if missing:
+        print(f"WARNING: {len(missing)} chain records not found, first {missing[0]}")
+    return [r for r in records if r is not None]
+
+@gzip_response()
 def lambda_handler(event, context):
     try:
         # Parse request
-        body = json.loads(event['body']) if isinstance(event.get('body'), str) else event.get('body', {})
-        title_hash = body.get('title_hash')
+        body = json.loads(event['body']) if isinstance(event.get('body'), str) else (event.get('body') or {})
+        params = dict(event.get('queryStringParameters') or {}, **body)
+        title_hash = params.get('title_hash')
         
         if not title_hash:
             return {
@@ -56,32 +110,51 @@ def lambda_handler(event, context):
                     'Content-Type': 'application/json',
                     'Access-Control-Allow-Origin': '*'
                 },
-                'body': json.dumps({'ownership_history': [formatted_record]}, cls=DecimalEncoder)
+                'body': json.dumps({'ownership_history': [formatted_record]}, default=json_default)
             }
         
         print(f"InitialHash: {initial_hash}")
         
-        # Scan for all records with this InitialHash
-        history_response = table.scan(
-            FilterExpression='InitialHash = :initial_hash',
-            ExpressionAttributeValues={':initial_hash': initial_hash}
-        )
-        
-        history_items = history_response.get('Items', [])
+        try:
+            limit = min(int(params.get('limit') or DEFAULT_LIMIT), MAX_LIMIT)
+            order = (params.get('order') or 'asc').lower()
+            mode = (params.get('mode') or 'index').lower()
+            if limit <= 0 or order not in ('asc', 'desc'):
+                raise ValueError('limit must be positive and order must be asc or desc')
+            if mode not in ('index', 'batch'):
+                raise ValueError('mode must be index or batch')
+            start_key = decode_cursor(params['cursor'], initial_hash) if params.get('cursor') else None
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({'error': str(e)})
+            }
         
-        # Handle pagination
-        while 'LastEvaluatedKey' in history_response:
-            history_response = table.scan(
-                FilterExpression='InitialHash = :initial_hash',
+        if mode == 'batch':
+            # Whole chain by point reads; the chain is complete, so no cursor
+            history_items = chain_history_batch(response['Item'], initial_hash)
+            if order == 'desc':
+                history_items.reverse()
+            last_key = None
+            total_transfers = max((int(i.get('TransferCount', 0)) for i in history_items), default=0)
+        else:
+            # Query the chain's partition of InitialHashIndex, already ordered by TransferCount
+            history_items, last_key = query_page(
+                table.name,
+                limit,
+                start_key,
+                IndexName=INITIAL_HASH_INDEX,
+                KeyConditionExpression='InitialHash = :initial_hash',
                 ExpressionAttributeValues={':initial_hash': initial_hash},
-                ExclusiveStartKey=history_response['LastEvaluatedKey']
+                ScanIndexForward=(order == 'asc')
             )
-            history_items.extend(history_response.get('Items', []))
-        
-        print(f"Found {len(history_items)} records in chain")
+            total_transfers = latest_transfer_count(initial_hash)
         
-        # Sort by TransferCount to show chronological order
-        history_items.sort(key=lambda x: int(x.get('TransferCount', 0)))
+        print(f"Found {len(history_items)} records in chain (mode={mode}, order={order}, more={last_key is not None})")
         
         # Format each record for the dashboard
         formatted_history = []
@@ -98,8 +171,10 @@ def lambda_handler(event, context):
             },
             'body': json.dumps({
                 'ownership_history': formatted_history,
-                'total_transfers': len(formatted_history) - 1 if formatted_history else 0
-            }, cls=DecimalEncoder)
+                'total_transfers': total_transfers,
+                'order': order,
+                'next_cursor': encode_cursor(last_key, initial_hash) if last_key else None
+            }, default=json_default)
         }
         
     except Exception as ex:
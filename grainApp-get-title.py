@@ -0,0 +1,59 @@
+import json
+import boto3
+from item_codec import json_default
+
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table('GrainTitles')
+
+def lambda_handler(event, context):
+    """Full record for one title; listing endpoints only return slim views"""
+    try:
+        params = event.get('queryStringParameters') or {}
+        body = json.loads(event['body']) if isinstance(event.get('body'), str) else (event.get('body') or {})
+        title_hash = params.get('title_hash') or body.get('title_hash') or body.get('TitleHash')
+
+        if not title_hash:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({'error': 'title_hash is required'})
+            }
+
+        response = table.get_item(Key={'TitleHash': title_hash})
+
+        if 'Item' not in response:
+            return {
+                'statusCode': 404,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({'error': 'Title not found'})
+            }
+
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'item': response['Item']}, default=json_default)
+        }
+
+    except Exception as ex:
+        print(f"Error: {str(ex)}")
+        import traceback
+        traceback.print_exc()
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': str(ex)})
+        }
+
+handler = lambda_handler
@@ -1,8 +1,6 @@
-import json,boto3
-from decimal import Decimal
-class DE(json.JSONEncoder):
-    def default(self,o):return float(o)if isinstance(o,Decimal)else super().default(o)
+import json
+from item_codec import query_items,json_default
+from projections import projection_kwargs
 def handler(e,c):
-    t=boto3.resource('dynamodb').Table('GrainTitles')
-    r=t.query(IndexName='StatusIndex',KeyConditionExpression='#s=:v',ExpressionAttributeNames={'#s':'Status'},ExpressionAttributeValues={':v':'InRoute'})
-    return{'statusCode':200,'headers':{'Content-Type':'application/json'},'body':json.dumps({'count':len(r.get('Items',[])),'items':r.get('Items',[])},cls=DE)}
+    i=list(query_items('GrainTitles',**projection_kwargs('listing',IndexName='StatusIndex',KeyConditionExpression='#s=:v',ExpressionAttributeNames={'#s':'Status'},ExpressionAttributeValues={':v':'InRoute'})))
+    return{'statusCode':200,'headers':{'Content-Type':'application/json'},'body':json.dumps({'count':len(i),'items':i},default=json_default)}
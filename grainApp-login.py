@@ -1,5 +1,7 @@
 import os
+from http_compression import gzip_response
 
+@gzip_response(static_key='login')
 def handler(event, context):
     cognito_domain = os.environ['COGNITO_DOMAIN']
     client_id = os.environ['CLIENT_ID']
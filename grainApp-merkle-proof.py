@@ -0,0 +1,82 @@
+import json
+import boto3
+from functools import lru_cache
+from merkle import load_tree, inclusion_proof, verify_proof, tree_name, roots_table
+
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table('GrainTitles')
+
+HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+    'Access-Control-Allow-Methods': 'OPTIONS,GET,POST'
+}
+
+@lru_cache(maxsize=32)
+def cached_tree(day, tree, root):
+    # Keyed by the published root too, so a rebuilt day is reloaded instead of served stale
+    return load_tree(day, tree)
+
+def lambda_handler(event, context):
+    """Inclusion proof for one title against its day's published Merkle root"""
+    try:
+        params = event.get('queryStringParameters') or {}
+        body = json.loads(event['body']) if isinstance(event.get('body'), str) else (event.get('body') or {})
+        params = dict(params, **body)
+        title_hash = params.get('title_hash') or params.get('TitleHash')
+        by_grain = params.get('tree') == 'grain'
+
+        if not title_hash:
+            return {'statusCode': 400, 'headers': HEADERS, 'body': json.dumps({'error': 'title_hash is required'})}
+
+        record = table.get_item(
+            Key={'TitleHash': title_hash},
+            ProjectionExpression='TitleHash, GrainType, HashTimestamp'
+        ).get('Item')
+        if not record or not record.get('HashTimestamp'):
+            return {'statusCode': 404, 'headers': HEADERS, 'body': json.dumps({'error': 'Title not found'})}
+
+        day = record['HashTimestamp'][:10]
+        tree = tree_name(record.get('GrainType', 'Unknown') if by_grain else None)
+        root_item = roots_table.get_item(Key={'Day': day, 'Tree': tree}).get('Item')
+        tree_data = cached_tree(day, tree, root_item['Root']) if root_item else None
+        if not tree_data:
+            return {
+                'statusCode': 404,
+                'headers': HEADERS,
+                'body': json.dumps({'error': f'No Merkle root published for {day} yet', 'day': day, 'tree': tree})
+            }
+
+        index, proof = inclusion_proof(tree_data, title_hash)
+        if proof is None:
+            return {
+                'statusCode': 404,
+                'headers': HEADERS,
+                'body': json.dumps({'error': 'Title is not in the published tree', 'day': day, 'tree': tree})
+            }
+
+        root = root_item['Root']
+        return {
+            'statusCode': 200,
+            'headers': HEADERS,
+            'body': json.dumps({
+                'title_hash': title_hash,
+                'day': day,
+                'tree': tree,
+                'root': root,
+                'leaf_count': int(root_item['LeafCount']),
+                'leaf_index': index,
+                'proof': proof,
+                'verified': verify_proof(title_hash, proof, root),
+                'scheme': 'sha256, leaf = H(0x00 || hash), node = H(0x01 || left || right)'
+            })
+        }
+
+    except Exception as e:
+        print(f"ERROR: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {'statusCode': 500, 'headers': HEADERS, 'body': json.dumps({'error': str(e)})}
+
+handler = lambda_handler
@@ -0,0 +1,62 @@
+import json
+from datetime import datetime, timedelta
+from scan_engine import parallel_scan
+from merkle import build_levels, save_tree, tree_name, roots_table
+
+def day_records(day):
+    """TitleHash and GrainType of every record hashed on day (YYYY-MM-DD, UTC)"""
+    return list(parallel_scan(
+        'GrainTitles',
+        ProjectionExpression='TitleHash, GrainType, HashTimestamp',
+        FilterExpression='begins_with(HashTimestamp, :day)',
+        ExpressionAttributeValues={':day': day}
+    ))
+
+def build_day(day):
+    """Build and store the 'all' tree and one tree per grain type for day"""
+    records = day_records(day)
+    trees = {tree_name(): sorted(r['TitleHash'] for r in records)}
+    for record in records:
+        trees.setdefault(tree_name(record.get('GrainType', 'Unknown')), []).append(record['TitleHash'])
+
+    built_at = datetime.utcnow().isoformat()
+    roots = {}
+    for tree, title_hashes in trees.items():
+        title_hashes.sort()
+        if not title_hashes:
+            continue
+        levels = build_levels(title_hashes)
+        key = save_tree(day, tree, title_hashes, levels)
+        root = levels[-1][0]
+        roots_table.put_item(Item={
+            'Day': day,
+            'Tree': tree,
+            'Root': root,
+            'LeafCount': len(title_hashes),
+            'TreeKey': key,
+            'BuiltAt': built_at
+        })
+        roots[tree] = {'root': root, 'leaf_count': len(title_hashes)}
+    print(f"Built {len(roots)} Merkle trees for {day} over {len(records)} records")
+    return roots
+
+def lambda_handler(event, context):
+    """Scheduled daily; builds yesterday's trees unless event['day'] is given"""
+    try:
+        day = (event or {}).get('day') or (datetime.utcnow() - timedelta(days=1)).strftime('%Y-%m-%d')
+        datetime.strptime(day, '%Y-%m-%d')
+        roots = build_day(day)
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'day': day, 'roots': roots})
+        }
+    except Exception as e:
+        print(f"ERROR: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
+
+handler = lambda_handler
@@ -0,0 +1,170 @@
+import json
+from bisect import bisect_left
+from decimal import Decimal
+from chain_heads import load_chain_heads, get_table_version
+from http_compression import gzip_response
+from item_codec import json_default
+
+DEFAULT_LEVELS = 10
+
+# Warm-container ladders, rebuilt only when the table version moves
+ladder_cache = {
+    'version': None,
+    'ladders': {}
+}
+
+class PriceLadder:
+    """ForSale chain heads of one grain type aggregated by Price.
+
+    Levels are sorted by price with running totals, so the top N levels are a
+    slice and "cheapest way to cover Q bushels" is a binary search.
+    """
+    def __init__(self, heads):
+        by_price = {}
+        for head in heads:
+            price = Decimal(str(head.get('Price', 0)))
+            by_price.setdefault(price, []).append(head)
+
+        self.prices = sorted(by_price)
+        self.levels = []
+        self.cum_bushels = []
+        self.cum_cost = []
+        self.cum_max_quantity = []
+        bushels_total = 0
+        cost_total = Decimal(0)
+        max_quantity = 0
+        for price in self.prices:
+            offers = by_price[price]
+            bushels = sum(int(o.get('Quantity', 0)) for o in offers)
+            largest = max(offers, key=lambda o: int(o.get('Quantity', 0)))
+            bushels_total += bushels
+            cost_total += price * bushels
+            max_quantity = max(max_quantity, int(largest.get('Quantity', 0)))
+            self.levels.append({
+                'price': price,
+                'bushels': bushels,
+                'offers': len(offers),
+                'largest_offer': largest
+            })
+            self.cum_bushels.append(bushels_total)
+            self.cum_cost.append(cost_total)
+            self.cum_max_quantity.append(max_quantity)
+
+    def top_levels(self, n):
+        return [
+            {'price': l['price'], 'bushels': l['bushels'], 'offers': l['offers'], 'cumulative_bushels': c}
+            for l, c in zip(self.levels[:n], self.cum_bushels[:n])
+        ]
+
+    def cheapest_single_offer(self, quantity):
+        """Lowest-priced single title holding at least quantity bushels"""
+        i = bisect_left(self.cum_max_quantity, quantity)
+        if i == len(self.levels):
+            return None
+        # The first level whose running maximum reaches quantity is the level
+        # that introduced it, so its largest offer qualifies
+        return self.levels[i]['largest_offer']
+
+    def fill(self, quantity):
+        """Price levels needed to accumulate at least quantity bushels"""
+        i = bisect_left(self.cum_bushels, quantity)
+        if i == len(self.levels):
+            return None
+        return {
+            'levels_needed': i + 1,
+            'marginal_price': self.prices[i],
+            'bushels_available': self.cum_bushels[i],
+            'total_cost': self.cum_cost[i],
+            'average_price': (self.cum_cost[i] / self.cum_bushels[i]).quantize(Decimal('0.0001'))
+        }
+
+def get_ladders():
+    version = get_table_version()
+    if ladder_cache['version'] != version:
+        by_grain = {}
+        for head in load_chain_heads(status='ForSale', view='listing'):
+            by_grain.setdefault(head.get('GrainType', 'Unknown'), []).append(head)
+        ladder_cache['ladders'] = {grain: PriceLadder(heads) for grain, heads in by_grain.items()}
+        ladder_cache['version'] = version
+        print(f"Built price ladders for {len(by_grain)} grain types at version {version}")
+    return ladder_cache['ladders']
+
+def offer_summary(head):
+    return {
+        'TitleHash': head.get('TitleHash'),
+        'GrainType': head.get('GrainType'),
+        'Quantity': head.get('Quantity'),
+        'Price': head.get('Price'),
+        'SellerID': head.get('SellerID')
+    }
+
+@gzip_response()
+def lambda_handler(event, context):
+    try:
+        params = event.get('queryStringParameters') or {}
+        grain_type = params.get('grain_type')
+
+        try:
+            levels = int(params.get('levels') or DEFAULT_LEVELS)
+            quantity = int(params['quantity']) if params.get('quantity') else None
+            if levels <= 0 or (quantity is not None and quantity <= 0):
+                raise ValueError('levels and quantity must be positive')
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                    'Access-Control-Allow-Methods': 'OPTIONS,GET'
+                },
+                'body': json.dumps({'error': str(e)})
+            }
+
+        ladders = get_ladders()
+        grains = [grain_type] if grain_type else sorted(ladders)
+
+        result = {}
+        for grain in grains:
+            ladder = ladders.get(grain) or PriceLadder([])
+            entry = {
+                'levels': ladder.top_levels(levels),
+                'total_levels': len(ladder.levels),
+                'total_bushels': ladder.cum_bushels[-1] if ladder.cum_bushels else 0
+            }
+            if quantity is not None:
+                offer = ladder.cheapest_single_offer(quantity)
+                entry['cheapest_single_offer'] = offer_summary(offer) if offer else None
+                entry['fill'] = ladder.fill(quantity)
+            result[grain] = entry
+
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                'Access-Control-Allow-Methods': 'OPTIONS,GET'
+            },
+            'body': json.dumps({
+                'grains': result,
+                'quantity': quantity
+            }, default=json_default)
+        }
+
+    except Exception as e:
+        print(f"ERROR: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                'Access-Control-Allow-Methods': 'OPTIONS,GET'
+            },
+            'body': json.dumps({'error': str(e)})
+        }
+
+handler = lambda_handler
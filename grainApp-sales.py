@@ -1,63 +1,176 @@
 import json
-import boto3
-from decimal import Decimal
-from collections import defaultdict
+import base64
+import heapq
+import hashlib
+from decimal import Decimal, InvalidOperation
+from chain_heads import load_chain_heads, matches_conditions, get_table_version
+from http_compression import gzip_response
+from item_codec import json_default
 
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('GrainTitles')
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, Decimal):
-            return float(o)
-        return super().default(o)
+# sort name -> (attribute, descending)
+SORT_ORDERS = {
+    'price_asc': ('Price', False),
+    'price_desc': ('Price', True),
+    'quantity_asc': ('Quantity', False),
+    'quantity_desc': ('Quantity', True),
+    'newest': ('Timestamp', True),
+    'oldest': ('Timestamp', False)
+}
 
+# Warm-container cache of ForSale chain heads, valid for one table version
+sales_cache = {
+    'version': None,
+    'heads': []
+}
+
+def parse_decimal(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f'Invalid {name}')
+
+def encode_cursor(sort, key):
+    payload = json.dumps({'s': sort, 'v': str(key[0]), 'h': key[1]}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, sort):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key = (Decimal(payload['v']), payload['h'])
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if payload.get('s') != sort:
+        raise ValueError('Cursor does not match sort order')
+    return key
+
+def sort_key(item, attribute):
+    return (Decimal(str(item.get(attribute, 0))), item.get('InitialHash', item.get('TitleHash', '')))
+
+def get_for_sale_heads():
+    """Return (version, ForSale heads), reloading only when the version moved"""
+    # Read the version first so a concurrent write can only make the cache
+    # look older than it is, never newer
+    version = get_table_version()
+    if sales_cache['version'] != version:
+        sales_cache['heads'] = list(load_chain_heads(status='ForSale', view='listing'))
+        sales_cache['version'] = version
+        print(f"Loaded {len(sales_cache['heads'])} ForSale chain heads for version {version}")
+    else:
+        print(f"Using cached ForSale chain heads for version {version}")
+    return version, sales_cache['heads']
+
+def make_etag(version, params):
+    query = json.dumps(params, sort_keys=True)
+    return '"' + hashlib.sha256(f"{version}|{query}".encode()).hexdigest()[:32] + '"'
+
+def get_header(event, name):
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+@gzip_response()
 def lambda_handler(event, context):
     try:
-        # Scan entire table with consistent read
-        response = table.scan(ConsistentRead=True)
-        all_items = response.get('Items', [])
-        while 'LastEvaluatedKey' in response:
-            response = table.scan(
-                ExclusiveStartKey=response['LastEvaluatedKey'],
-                ConsistentRead=True
-            )
-            all_items.extend(response.get('Items', []))
-        
-        print(f"Total records: {len(all_items)}")
-        
-        # Group by InitialHash
-        chains = defaultdict(list)
-        for item in all_items:
-            initial_hash = item.get('InitialHash', item.get('TitleHash'))
-            chains[initial_hash].append(item)
-        
-        # Find chain heads that are ForSale
-        for_sale = []
-        for initial_hash, records in chains.items():
-            # Sort by TransferCount DESC to get head
-            records.sort(key=lambda x: int(x.get('TransferCount', 0)), reverse=True)
-            head = records[0]
-            
-            if head.get('Status') == 'ForSale':
-                for_sale.append(head)
-        
-        print(f"ForSale chain heads: {len(for_sale)}")
-        
+        params = event.get('queryStringParameters') or {}
+
+        try:
+            sort = params.get('sort') or 'newest'
+            if sort not in SORT_ORDERS:
+                raise ValueError(f"Invalid sort, expected one of {', '.join(SORT_ORDERS)}")
+            limit = int(params.get('limit') or DEFAULT_LIMIT)
+            if limit <= 0:
+                raise ValueError('limit must be positive')
+            limit = min(limit, MAX_LIMIT)
+
+            conditions = []
+            if params.get('grain_type'):
+                conditions.append(('GrainType', '=', params['grain_type']))
+            for name, attribute, op in [('min_price', 'Price', '>='), ('max_price', 'Price', '<='),
+                                        ('min_quantity', 'Quantity', '>='), ('max_quantity', 'Quantity', '<=')]:
+                value = parse_decimal(params, name)
+                if value is not None:
+                    conditions.append((attribute, op, value))
+
+            cursor_key = decode_cursor(params['cursor'], sort) if params.get('cursor') else None
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                    'Access-Control-Allow-Methods': 'OPTIONS,GET'
+                },
+                'body': json.dumps({'error': str(e)})
+            }
+
+        attribute, descending = SORT_ORDERS[sort]
+
+        # Same version and query means the same response
+        version, heads = get_for_sale_heads()
+        etag = make_etag(version, params)
+        if etag in [t.strip() for t in (get_header(event, 'If-None-Match') or '').split(',')]:
+            return {
+                'statusCode': 304,
+                'headers': {
+                    'ETag': etag,
+                    'Cache-Control': 'no-cache',
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,If-None-Match',
+                    'Access-Control-Allow-Methods': 'OPTIONS,GET',
+                    'Access-Control-Expose-Headers': 'ETag'
+                },
+                'body': ''
+            }
+
+        for_sale = [h for h in heads if matches_conditions(h, conditions)]
+        total = len(for_sale)
+
+        # Keyset pagination: keep only items after the cursor, then take one
+        # extra to know whether another page exists
+        candidates = for_sale
+        if cursor_key is not None:
+            if descending:
+                candidates = [i for i in for_sale if sort_key(i, attribute) < cursor_key]
+            else:
+                candidates = [i for i in for_sale if sort_key(i, attribute) > cursor_key]
+        select = heapq.nlargest if descending else heapq.nsmallest
+        page = select(limit + 1, candidates, key=lambda i: sort_key(i, attribute))
+
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = encode_cursor(sort, sort_key(page[-1], attribute))
+
+        print(f"ForSale chain heads: {total} matching, returning {len(page)}")
+
         return {
             'statusCode': 200,
             'headers': {
                 'Content-Type': 'application/json',
+                'ETag': etag,
+                'Cache-Control': 'no-cache',
                 'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                'Access-Control-Allow-Methods': 'OPTIONS,GET'
+                'Access-Control-Allow-Headers': 'Content-Type,Authorization,If-None-Match',
+                'Access-Control-Allow-Methods': 'OPTIONS,GET',
+                'Access-Control-Expose-Headers': 'ETag'
             },
             'body': json.dumps({
-                'items': for_sale,
-                'count': len(for_sale)
-            }, cls=DecimalEncoder)
+                'items': page,
+                'count': len(page),
+                'total': total,
+                'next_cursor': next_cursor
+            }, default=json_default)
         }
-        
+
     except Exception as e:
         print(f"ERROR: {str(e)}")
         import traceback
@@ -73,4 +186,4 @@ def lambda_handler(event, context):
             'body': json.dumps({'error': str(e)})
         }
 
-handler = lambda_handler
\ No newline at end of file
+handler = lambda_handler
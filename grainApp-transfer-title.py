@@ -1,17 +1,13 @@
 import json
 import boto3
-import hashlib
-from datetime import datetime
-from decimal import Decimal
+from title_transfer import commit_transfer, TransferConflict
+from item_codec import json_default
+from idempotency import idempotent
+from write_pipeline import wants_async, async_available, enqueue
 
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table('GrainTitles')
 
-def decimal_default(obj):
-    if isinstance(obj, Decimal):
-        return float(obj)
-    raise TypeError
-
 def get_user_info(event):
     """Extract user information from Cognito authorizer claims"""
     try:
@@ -47,6 +43,7 @@ def get_user_info(event):
         print(f"Error extracting user info: {str(e)}")
         return None
 
+@idempotent('transfer-title')
 def lambda_handler(event, context):
     try:
         # Extract user information - REQUIRED
@@ -56,7 +53,7 @@ def lambda_handler(event, context):
                 'statusCode': 401,
                 'headers': {
                     'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                     'Access-Control-Allow-Methods': 'OPTIONS,POST'
                 },
                 'body': json.dumps({'error': 'Unauthorized: Could not extract user information'})
@@ -78,7 +75,7 @@ def lambda_handler(event, context):
                 'statusCode': 400,
                 'headers': {
                     'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                     'Access-Control-Allow-Methods': 'OPTIONS,POST'
                 },
                 'body': json.dumps({'error': 'Missing title_hash'})
@@ -98,7 +95,7 @@ def lambda_handler(event, context):
                 'statusCode': 404,
                 'headers': {
                     'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                     'Access-Control-Allow-Methods': 'OPTIONS,POST'
                 },
                 'body': json.dumps({'error': 'Title not found'})
@@ -112,7 +109,7 @@ def lambda_handler(event, context):
                 'statusCode': 400,
                 'headers': {
                     'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                     'Access-Control-Allow-Methods': 'OPTIONS,POST'
                 },
                 'body': json.dumps({'error': 'Title is not available for purchase'})
@@ -126,96 +123,65 @@ def lambda_handler(event, context):
                 'statusCode': 400,
                 'headers': {
                     'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                     'Access-Control-Allow-Methods': 'OPTIONS,POST'
                 },
                 'body': json.dumps({'error': 'You cannot purchase your own title'})
             }
         
-        # Get current values
-        grain_type = current_title.get('GrainType')
-        quantity = int(current_title.get('Quantity', 0))
-        current_price = float(current_title.get('Price', 0))
-        price_string = current_title.get('PriceString', f"{current_price:.2f}")
-        initial_hash = current_title.get('InitialHash', title_hash)
-        current_hash = current_title.get('CurrentHash', title_hash)
-        hash_chain = current_title.get('HashChain', [title_hash])
-        
-        # Get the current transfer count and increment for the new record
-        current_transfer_count = int(current_title.get('TransferCount', 0))
-        new_transfer_count = current_transfer_count + 1
-        
-        # Generate new timestamp
-        timestamp = int(datetime.utcnow().timestamp())
-        timestamp_iso = datetime.utcnow().isoformat()
-        
-        # Calculate new hash (includes previous hash for chain integrity)
-        hash_input = f"{current_hash}{grain_type}{quantity}{buyer_id}{price_string}{timestamp_iso}{new_transfer_count}"
-        new_hash = hashlib.sha256(hash_input.encode()).hexdigest()
-        
-        print(f"New hash input: {hash_input}")
-        print(f"New hash: {new_hash}")
-        print(f"Transfer count: {new_transfer_count}")
-        
-        # Update hash chain
-        new_hash_chain = hash_chain + [new_hash]
-        
-        # STEP 1: Update the OLD record to mark as Transferred and record buyer
-        table.update_item(
-            Key={'TitleHash': title_hash},
-            UpdateExpression='''SET 
-                #status = :status,
-                BuyerID = :buyer_id,
-                BuyerName = :buyer_name,
-                BuyerSub = :buyer_sub,
-                LastTransferTimestamp = :timestamp,
-                LastTransferTimestampISO = :timestamp_iso
-            ''',
-            ExpressionAttributeNames={
-                '#status': 'Status'
-            },
-            ExpressionAttributeValues={
-                ':status': 'Transferred',
-                ':buyer_id': buyer_id,
-                ':buyer_name': buyer_name,
-                ':buyer_sub': buyer_sub,
-                ':timestamp': timestamp,
-                ':timestamp_iso': timestamp_iso
+        # Async mode: queue the write behind any others on this chain and answer with a ticket
+        if wants_async(event, body):
+            if not async_available():
+                return {
+                    'statusCode': 503,
+                    'headers': {
+                        'Access-Control-Allow-Origin': '*',
+                        'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
+                        'Access-Control-Allow-Methods': 'OPTIONS,POST'
+                    },
+                    'body': json.dumps({'error': 'Async writes are not available; retry without async'})
+                }
+            ticket_id = enqueue('transfer', current_title.get('InitialHash', title_hash), title_hash, buyer_id, {
+                'title_hash': title_hash,
+                'buyer_id': buyer_id,
+                'buyer_name': buyer_name,
+                'buyer_sub': buyer_sub
+            })
+            return {
+                'statusCode': 202,
+                'headers': {
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
+                    'Access-Control-Allow-Methods': 'OPTIONS,POST'
+                },
+                'body': json.dumps({
+                    'message': 'Transfer queued',
+                    'ticket_id': ticket_id,
+                    'status': 'QUEUED',
+                    'status_url': f'/write-status?ticket_id={ticket_id}',
+                    'old_hash': title_hash,
+                    'buyer_id': buyer_id,
+                    'seller_id': current_seller_id
+                })
             }
-        )
         
-        # STEP 2: Create NEW record with new hash (this preserves the chain!)
-        new_item = {
-            'TitleHash': new_hash,
-            'InitialHash': initial_hash,
-            'CurrentHash': new_hash,
-            'PreviousHash': current_hash,
-            'HashChain': new_hash_chain,
-            'GrainType': grain_type,
-            'Quantity': quantity,
-            'Price': Decimal(price_string),
-            'PriceString': price_string,
-            'SellerID': buyer_id,  # Buyer becomes new seller/owner
-            'SellerName': buyer_name,
-            'SellerSub': buyer_sub,
-            'BuyerID': 'NONE',
-            'BuyerName': 'NONE',
-            'BuyerSub': 'NONE',
-            'Status': 'Transferred',  # Not for sale until relisted
-            'TransferCount': new_transfer_count,
-            'HashTimestamp': timestamp_iso,
-            'Timestamp': timestamp,
-            'TimestampISO': timestamp_iso,
-            'LastTransferTimestamp': timestamp,
-            'LastTransferTimestampISO': timestamp_iso,
-            'CreatedBy': current_title.get('CreatedBy', current_seller_id),
-            'CreatedBySub': current_title.get('CreatedBySub', ''),
-            'CreatedByUsername': current_title.get('CreatedByUsername', ''),
-            'TransferredBy': current_seller_id,
-            'TransferredTo': buyer_id
-        }
-        
-        table.put_item(Item=new_item)
+        # Old record update, new record and chain head commit together or not at all
+        try:
+            new_item = commit_transfer(current_title, buyer_id, buyer_name, buyer_sub)
+        except TransferConflict as e:
+            print(f"Transfer conflict on {title_hash}: {e} {e.reasons}")
+            return {
+                'statusCode': 409,
+                'headers': {
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
+                    'Access-Control-Allow-Methods': 'OPTIONS,POST'
+                },
+                'body': json.dumps({'error': str(e)})
+            }
+        new_hash = new_item['TitleHash']
+        current_hash = new_item['PreviousHash']
+        new_transfer_count = new_item['TransferCount']
         
         print(f"Title transferred successfully to {buyer_id}")
         print(f"Old record {title_hash} marked as Transferred")
@@ -225,7 +191,7 @@ def lambda_handler(event, context):
             'statusCode': 200,
             'headers': {
                 'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                 'Access-Control-Allow-Methods': 'OPTIONS,POST'
             },
             'body': json.dumps({
@@ -237,7 +203,7 @@ def lambda_handler(event, context):
                 'seller_id': current_seller_id,
                 'transfer_count': new_transfer_count,
                 'new_status': 'Transferred'
-            }, default=decimal_default)
+            }, default=json_default)
         }
         
     except Exception as e:
@@ -249,7 +215,7 @@ def lambda_handler(event, context):
             'statusCode': 500,
             'headers': {
                 'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                 'Access-Control-Allow-Methods': 'OPTIONS,POST'
             },
             'body': json.dumps({
@@ -1,48 +1,194 @@
+import os
 import json
+import time
 import boto3
-import hashlib
+from datetime import datetime
+from botocore.exceptions import ClientError
+from item_codec import query_page
+from title_hashing import HASH_FIELDS, hash_input, compute_hash
+from validation_cache import make_cache, fields_digest
 
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table('GrainTitles')
+# Partition key InitialHash (S): highest TransferCount and hash already proven for the chain
+checkpoints_table = dynamodb.Table(os.environ.get('VALIDATION_CHECKPOINTS_TABLE', 'GrainValidationCheckpoints'))
+INITIAL_HASH_INDEX = 'InitialHashIndex'
+# GSIs on GrainTitles, partition key only, projection KEYS_ONLY (see backfill_hash_indexes.py)
+HASH_LOOKUP_INDEXES = [
+    ('CurrentHash', 'CurrentHashIndex'),
+    ('FinalTitleHash', 'FinalTitleHashIndex')
+]
+LINK_PAGE_SIZE = 500
+# Lives for the warm container; see validation_cache.py for the tiers
+validation_cache = make_cache()
 
-def validate_single_record(item):
+def validate_single_record(item, verbose=True):
     """Validate a single record's hash"""
-    grain = item['GrainType']
-    qty = int(item['Quantity'])
-    price = item['PriceString']
-    transfer_count = int(item.get('TransferCount', 0))
-    relist_count = int(item.get('RelistCount', 0))
+    calculated_hash = compute_hash(item)
     stored_hash = item['CurrentHash']
-    seller_id = item.get('SellerID', '')
-    status = item.get('Status', '')
     
-    if transfer_count == 0 and relist_count == 0:
-        # Original creation hash format:
-        # hash_input = f"{grain_type}{quantity}{seller_id}{price_string}{timestamp}"
-        timestamp = item.get('HashTimestamp') or item.get('TimestampISO')
-        hash_input = f"{grain}{qty}{seller_id}{price}{timestamp}"
-    elif relist_count > 0 and status == 'ForSale':
-        # Relist hash format:
-        # hash_input = f"{previous_hash}{grain_type}{quantity}{owner_id}{price}{timestamp_iso}{transfer_count}R{relist_count}"
-        prev = item.get('PreviousHash', '')
-        timestamp = item.get('HashTimestamp') or item.get('RelistedAtISO', '')
-        hash_input = f"{prev}{grain}{qty}{seller_id}{price}{timestamp}{transfer_count}R{relist_count}"
-    else:
-        # Transfer hash format - SellerID is the buyer who just received this
-        # hash_input = f"{previous_hash}{grain_type}{quantity}{buyer_id}{price}{timestamp_iso}{transfer_count}"
-        prev = item.get('PreviousHash', '')
-        timestamp = item.get('LastTransferTimestampISO') or item.get('HashTimestamp', '')
-        hash_input = f"{prev}{grain}{qty}{seller_id}{price}{timestamp}{transfer_count}"
+    if verbose:
+        print(f"Transfer #{int(item.get('TransferCount', 0))}, Relist #{int(item.get('RelistCount', 0))}, Status: {item.get('Status', '')}:")
+        print(f"  Hash input: {hash_input(item)}")
+        print(f"  Calculated: {calculated_hash}")
+        print(f"  Stored:     {stored_hash}")
+        print(f"  Match: {calculated_hash == stored_hash}")
     
-    calculated_hash = hashlib.sha256(hash_input.encode()).hexdigest()
+    return calculated_hash == stored_hash
+
+def load_hashed_fields(title_hash):
+    """Just the attributes the hash covers, to confirm a cached verdict"""
+    return table.get_item(
+        Key={'TitleHash': title_hash},
+        ProjectionExpression=', '.join(f'#h{i}' for i in range(len(HASH_FIELDS))),
+        ExpressionAttributeNames={f'#h{i}': name for i, name in enumerate(HASH_FIELDS)}
+    ).get('Item')
+
+def resolve_hash(value):
+    """Record for a pasted TitleHash, CurrentHash or FinalTitleHash, and which one matched"""
+    response = table.get_item(Key={'TitleHash': value})
+    if 'Item' in response:
+        return response['Item'], 'TitleHash'
     
-    print(f"Transfer #{transfer_count}, Relist #{relist_count}, Status: {status}:")
-    print(f"  Hash input: {hash_input}")
-    print(f"  Calculated: {calculated_hash}")
-    print(f"  Stored:     {stored_hash}")
-    print(f"  Match: {calculated_hash == stored_hash}")
+    for attribute, index_name in HASH_LOOKUP_INDEXES:
+        # KEYS_ONLY indexes: one query maps the hash to its TitleHash
+        matches, _ = query_page(
+            table.name,
+            1,
+            IndexName=index_name,
+            KeyConditionExpression='#h = :hash',
+            ExpressionAttributeNames={'#h': attribute},
+            ExpressionAttributeValues={':hash': value}
+        )
+        if matches:
+            item = table.get_item(Key={'TitleHash': matches[0]['TitleHash']}).get('Item')
+            if item:
+                return item, attribute
+    return None, None
+
+def get_checkpoint(initial_hash):
+    return checkpoints_table.get_item(Key={'InitialHash': initial_hash}).get('Item')
+
+def save_checkpoint(initial_hash, item):
+    """Advance the chain's checkpoint to item; never moves it backwards"""
+    transfer_count = int(item.get('TransferCount', 0))
+    try:
+        checkpoints_table.put_item(
+            Item={
+                'InitialHash': initial_hash,
+                'VerifiedTransferCount': transfer_count,
+                'VerifiedHash': item['CurrentHash'],
+                'VerifiedAt': datetime.utcnow().isoformat()
+            },
+            ConditionExpression='attribute_not_exists(InitialHash) OR VerifiedTransferCount < :tc',
+            ExpressionAttributeValues={':tc': transfer_count}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+def fetch_chain_links(initial_hash, low, high):
+    """Chain records with low <= TransferCount <= high, keyed by CurrentHash.
+
+    One InitialHashIndex range query, so the round trips are bounded by page
+    size rather than chain length. Returns (records, round_trips).
+    """
+    records = {}
+    round_trips = 0
+    start_key = None
+    while True:
+        items, start_key = query_page(
+            table.name,
+            LINK_PAGE_SIZE,
+            start_key,
+            IndexName=INITIAL_HASH_INDEX,
+            KeyConditionExpression='InitialHash = :initial_hash AND TransferCount BETWEEN :low AND :high',
+            ExpressionAttributeValues={':initial_hash': initial_hash, ':low': low, ':high': high}
+        )
+        round_trips += 1
+        for record in items:
+            records[record['CurrentHash']] = record
+        if not start_key:
+            return records, round_trips
+
+def validate_chain(item):
+    """Validate item and every link behind it back to the checkpoint or genesis.
+
+    Links at or below a chain's checkpoint were proven by an earlier call, so
+    only records added since are fetched and re-hashed. A record on a branch
+    that forked below the checkpoint never reaches it; the older links are
+    fetched then and the walk goes on to genesis.
+    """
+    started = time.perf_counter()
+    initial_hash = item.get('InitialHash', item['TitleHash'])
+    checkpoint = get_checkpoint(initial_hash)
+    checkpoint_count = int(checkpoint['VerifiedTransferCount']) if checkpoint else None
+    target_count = int(item.get('TransferCount', 0))
     
-    return calculated_hash == stored_hash
+    low = checkpoint_count if checkpoint_count is not None and checkpoint_count <= target_count else 0
+    records, round_trips = fetch_chain_links(initial_hash, low, target_count)
+    fetched = time.perf_counter()
+    
+    links = []
+    first_broken_link = None
+    record = records.get(item['CurrentHash'], item)
+    while True:
+        if checkpoint and record['CurrentHash'] == checkpoint['VerifiedHash']:
+            print(f"Reached checkpoint at transfer #{checkpoint_count}")
+            break
+        
+        transfer_count = int(record.get('TransferCount', 0))
+        link = {
+            'transfer_count': transfer_count,
+            'hash': record['CurrentHash'],
+            'hash_valid': validate_single_record(record, verbose=False),
+            'link_valid': True
+        }
+        links.append(link)
+        
+        previous = None
+        if transfer_count == 0:
+            link['link_valid'] = record['CurrentHash'] == initial_hash
+        else:
+            previous = records.get(record.get('PreviousHash', ''))
+            if not previous and low > 0:
+                # On a branch that forked at or below the checkpoint; fetch the rest before calling it broken
+                older, older_trips = fetch_chain_links(initial_hash, 0, low - 1)
+                records.update(older)
+                round_trips += older_trips
+                low = 0
+                previous = records.get(record.get('PreviousHash', ''))
+            link['link_valid'] = bool(previous) and int(previous.get('TransferCount', 0)) == transfer_count - 1
+        
+        if not (link['hash_valid'] and link['link_valid']):
+            reason = 'hash mismatch' if not link['hash_valid'] else 'broken PreviousHash link'
+            # Walking newest to oldest; keep the oldest failure
+            first_broken_link = dict(link, reason=reason)
+        if not previous:
+            break
+        record = previous
+    
+    links.reverse()
+    valid = first_broken_link is None
+    if valid:
+        save_checkpoint(initial_hash, item)
+    finished = time.perf_counter()
+    
+    result = {
+        'valid': valid,
+        'links_checked': len(links),
+        'checkpoint_transfer_count': checkpoint_count,
+        'first_broken_link': first_broken_link,
+        'links': links,
+        'timings': {
+            'fetch_ms': round((fetched - started) * 1000, 2),
+            'verify_ms': round((finished - fetched) * 1000, 2),
+            'total_ms': round((finished - started) * 1000, 2),
+            'round_trips': round_trips
+        }
+    }
+    print(f"Chain check: valid={valid}, links={len(links)}, first_broken={first_broken_link}, timings={result['timings']}")
+    return result
 
 def handler(event, context):
     try:
@@ -52,27 +198,45 @@ def handler(event, context):
         if not hash_to_validate:
             return {'statusCode': 400, 'body': json.dumps({'chain_valid': False})}
         
-        # First try to find by TitleHash (primary key)
-        response = table.get_item(Key={'TitleHash': hash_to_validate})
+        full_chain = bool(body.get('validate_full_chain'))
+        cached = None
         
-        if 'Item' not in response:
-            # Maybe they sent CurrentHash - scan for it
-            scan_response = table.scan(
-                FilterExpression='CurrentHash = :hash',
-                ExpressionAttributeValues={':hash': hash_to_validate}
-            )
-            items = scan_response.get('Items', [])
-            if not items:
-                return {'statusCode': 404, 'body': json.dumps({'chain_valid': False})}
-            item = items[0]
+        # Single-record verdicts are memoized by the requested hash; a hit skips re-hashing the record
+        entry, cached = (None, None) if full_chain else validation_cache.lookup(hash_to_validate, load_hashed_fields)
+        if entry:
+            is_valid, matched_on = entry['Valid'], entry['MatchedOn']
         else:
-            item = response['Item']
+            item, matched_on = resolve_hash(hash_to_validate)
+            if not item:
+                return {'statusCode': 404, 'body': json.dumps({'chain_valid': False})}
         
-        # Validate this record
-        is_valid = validate_single_record(item)
+        # Validate this record, or the whole chain behind it
+        chain = None
+        if full_chain:
+            chain = validate_chain(item)
+            is_valid = chain['valid']
+        elif not cached:
+            is_valid = validate_single_record(item)
+            validation_cache.put(item['TitleHash'], fields_digest(item), is_valid, hash_to_validate, matched_on)
         
         print(f"Final result: {'VALID' if is_valid else 'INVALID'}")
         
+        result = {
+            'chain_valid': is_valid,
+            'isValid': is_valid,
+            'validationStatus': 'Valid' if is_valid else 'Invalid',
+            'matched_on': matched_on,
+            'cached': cached
+        }
+        if chain:
+            result.update({
+                'links_checked': chain['links_checked'],
+                'checkpoint_transfer_count': chain['checkpoint_transfer_count'],
+                'first_broken_link': chain['first_broken_link'],
+                'links': chain['links'],
+                'timings': chain['timings']
+            })
+        
         return {
             'statusCode': 200,
             'headers': {
@@ -80,11 +244,7 @@ def handler(event, context):
                 'Access-Control-Allow-Headers': 'Content-Type,Authorization',
                 'Access-Control-Allow-Methods': 'OPTIONS,POST'
             },
-            'body': json.dumps({
-                'chain_valid': is_valid,
-                'isValid': is_valid,
-                'validationStatus': 'Valid' if is_valid else 'Invalid'
-            })
+            'body': json.dumps(result)
         }
     except Exception as e:
         print(f"ERROR: {e}")
@@ -0,0 +1,66 @@
+import json
+from write_pipeline import get_ticket, FINAL_STATUSES
+from item_codec import json_default
+
+HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+    'Access-Control-Allow-Methods': 'OPTIONS,GET'
+}
+
+def get_caller(event):
+    """(email, is_admin) from Cognito authorizer claims, or (None, False)"""
+    claims = event.get('requestContext', {}).get('authorizer', {}).get('claims', {})
+    if not claims:
+        return None, False
+    groups_claim = claims.get('cognito:groups', '')
+    if isinstance(groups_claim, str):
+        groups = [g.strip() for g in groups_claim.split(',')] if groups_claim else []
+    else:
+        groups = groups_claim if isinstance(groups_claim, list) else []
+    return claims.get('email', ''), 'Admin' in groups or 'Admins' in groups
+
+def lambda_handler(event, context):
+    """Resolve an async write ticket from transfer-title or relist-title"""
+    try:
+        email, is_admin = get_caller(event)
+        if not email:
+            return {'statusCode': 401, 'headers': HEADERS, 'body': json.dumps({'error': 'Unauthorized'})}
+
+        params = event.get('queryStringParameters') or {}
+        path_params = event.get('pathParameters') or {}
+        ticket_id = params.get('ticket_id') or params.get('ticket') or path_params.get('ticket_id')
+        if not ticket_id:
+            return {'statusCode': 400, 'headers': HEADERS, 'body': json.dumps({'error': 'Missing ticket_id'})}
+
+        ticket = get_ticket(ticket_id)
+        # Someone else's ticket looks the same as a missing one
+        if not ticket or (not is_admin and ticket.get('RequestedBy', '').lower() != email.lower()):
+            return {'statusCode': 404, 'headers': HEADERS, 'body': json.dumps({'error': 'Ticket not found'})}
+
+        return {
+            'statusCode': 200,
+            'headers': HEADERS,
+            'body': json.dumps({
+                'ticket_id': ticket_id,
+                'kind': ticket.get('Kind'),
+                'status': ticket.get('Status'),
+                'done': ticket.get('Status') in FINAL_STATUSES,
+                'title_hash': ticket.get('TitleHash'),
+                'status_code': ticket.get('StatusCode'),
+                'result': ticket.get('Result'),
+                'error': ticket.get('LastError'),
+                'attempts': ticket.get('Attempts', 0),
+                'created_at': ticket.get('CreatedAt'),
+                'updated_at': ticket.get('UpdatedAt')
+            }, default=json_default)
+        }
+
+    except Exception as e:
+        print(f"ERROR: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {'statusCode': 500, 'headers': HEADERS, 'body': json.dumps({'error': str(e)})}
+
+handler = lambda_handler
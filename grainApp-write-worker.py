@@ -0,0 +1,120 @@
+import json
+import boto3
+from write_pipeline import process_records, local_queue, WriteRejected
+from title_transfer import commit_transfer, transfer_error, TransferConflict
+from title_relist import commit_relist, relist_error
+from item_codec import query_page
+
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table('GrainTitles')
+# GSI on GrainTitles: partition InitialHash (S), sort TransferCount (N), projection ALL
+INITIAL_HASH_INDEX = 'InitialHashIndex'
+
+def load_title(title_hash):
+    response = table.get_item(Key={'TitleHash': title_hash}, ConsistentRead=True)
+    if 'Item' not in response:
+        raise WriteRejected(404, 'Title not found')
+    return response['Item']
+
+def written_successor(current_title, ticket_id):
+    """The link after current_title that ticket_id wrote, or None.
+
+    A message can be redelivered after its transaction committed but before
+    its ticket was settled; the retry then fails its checks against the
+    record it already moved on. The WriteTicket on the next link tells that
+    apart from a write that was really refused.
+    """
+    initial_hash = current_title.get('InitialHash', current_title['TitleHash'])
+    records, _ = query_page(
+        table.name,
+        10,
+        IndexName=INITIAL_HASH_INDEX,
+        KeyConditionExpression='InitialHash = :initial_hash AND TransferCount = :tc',
+        ExpressionAttributeValues={
+            ':initial_hash': initial_hash,
+            ':tc': int(current_title.get('TransferCount', 0)) + 1
+        }
+    )
+    for record in records:
+        if record.get('WriteTicket') == ticket_id:
+            print(f"Ticket {ticket_id} was already applied as {record['TitleHash']}")
+            return record
+    return None
+
+def apply_transfer(payload, ticket_id):
+    current_title = load_title(payload['title_hash'])
+    try:
+        # Re-check: earlier writes to this chain may have changed it since the request
+        error = transfer_error(current_title, payload['buyer_id'])
+        if error:
+            raise WriteRejected(*error)
+        new_item = commit_transfer(current_title, payload['buyer_id'], payload['buyer_name'],
+                                   payload['buyer_sub'], ticket_id)
+    except (WriteRejected, TransferConflict) as e:
+        new_item = written_successor(current_title, ticket_id)
+        if not new_item:
+            raise e if isinstance(e, WriteRejected) else WriteRejected(409, str(e))
+    return {
+        'old_hash': current_title['TitleHash'],
+        'new_hash': new_item['TitleHash'],
+        'previous_hash': new_item['PreviousHash'],
+        'buyer_id': payload['buyer_id'],
+        'seller_id': current_title.get('SellerID', ''),
+        'transfer_count': int(new_item['TransferCount']),
+        'new_status': 'Transferred'
+    }
+
+def apply_relist(payload, ticket_id):
+    current_title = load_title(payload['title_hash'])
+    try:
+        error = relist_error(current_title, payload['owner_id'])
+        if error:
+            raise WriteRejected(*error)
+        new_item = commit_relist(current_title, payload['owner_id'], payload['owner_name'],
+                                 payload['owner_sub'], payload['price_string'], ticket_id)
+    except (WriteRejected, TransferConflict) as e:
+        new_item = written_successor(current_title, ticket_id)
+        if not new_item:
+            raise e if isinstance(e, WriteRejected) else WriteRejected(409, str(e))
+    return {
+        'old_hash': current_title['TitleHash'],
+        'new_hash': new_item['TitleHash'],
+        'new_price': payload['price_string'],
+        'transfer_count': int(new_item['TransferCount']),
+        'status': 'ForSale'
+    }
+
+APPLIERS = {
+    'transfer': apply_transfer,
+    'relist': apply_relist
+}
+
+def apply(kind, payload, ticket_id):
+    if kind not in APPLIERS:
+        raise WriteRejected(400, f'Unknown write kind {kind}')
+    return APPLIERS[kind](payload, ticket_id)
+
+def lambda_handler(event, context):
+    """SQS FIFO trigger; reports failures per message (ReportBatchItemFailures)"""
+    records = event.get('Records', [])
+    failed = process_records(records, apply)
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed]}
+
+def drain_local(max_batches=100):
+    """Apply everything queued on the in-process LocalQueue; returns the number of records handled"""
+    handled = 0
+    for _ in range(max_batches):
+        records = local_queue.receive()
+        if not records:
+            break
+        failed = set(process_records(records, apply))
+        local_queue.requeue([r for r in records if r['messageId'] in failed])
+        handled += len(records) - len(failed)
+        if len(failed) == len(records):
+            break
+    return handled
+
+handler = lambda_handler
+
+if __name__ == '__main__':
+    print(json.dumps({'applied': drain_local()}))
@@ -0,0 +1,64 @@
+"""gzip compression for API Gateway proxy responses.
+
+Wrap a handler with @gzip_response() to compress its body when the client
+sends Accept-Encoding: gzip and the body is at least MIN_COMPRESS_BYTES.
+Compressed bodies are returned base64-encoded with isBase64Encoded set, which
+is what API Gateway expects (REST APIs need a binary media type of */* for
+the decode to happen).
+
+Handlers whose body never changes within a container (the dashboard and
+login pages) pass static_key so the compressed body is built only once.
+"""
+import os
+import gzip
+import base64
+import functools
+
+MIN_COMPRESS_BYTES = int(os.environ.get('MIN_COMPRESS_BYTES', '1024'))
+
+# static_key -> base64 gzip body, kept for the life of the container
+static_bodies = {}
+
+def accepts_gzip(event):
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() != 'accept-encoding' or not value:
+            continue
+        for coding in value.split(','):
+            name, _, params = coding.strip().partition(';')
+            if name.strip().lower() in ('gzip', '*'):
+                return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+def compress_response(event, response, static_key=None):
+    """Return response with a gzip body if the client accepts it"""
+    body = response.get('body')
+    if not isinstance(body, str) or response.get('isBase64Encoded'):
+        return response
+
+    raw = body.encode('utf-8')
+    if len(raw) < MIN_COMPRESS_BYTES:
+        return response
+
+    headers = dict(response.get('headers') or {})
+    headers['Vary'] = 'Accept-Encoding'
+    if not accepts_gzip(event):
+        return dict(response, headers=headers)
+
+    if static_key and static_key in static_bodies:
+        encoded = static_bodies[static_key]
+    else:
+        encoded = base64.b64encode(gzip.compress(raw, compresslevel=6)).decode('ascii')
+        if static_key:
+            static_bodies[static_key] = encoded
+
+    headers['Content-Encoding'] = 'gzip'
+    return dict(response, headers=headers, body=encoded, isBase64Encoded=True)
+
+def gzip_response(static_key=None):
+    """Decorator form of compress_response() for Lambda handlers"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            return compress_response(event, handler(event, context), static_key)
+        return wrapper
+    return decorator
@@ -0,0 +1,153 @@
+"""Idempotency-Key support for write handlers.
+
+Create, transfer and relist hash a fresh utcnow() timestamp, so a client
+retry after a throttle or gateway timeout would otherwise mint a second
+record or fork the chain. A handler wrapped with @idempotent(scope) honours
+an Idempotency-Key request header:
+
+  first request    claims the key (conditional put, Status IN_PROGRESS),
+                   runs the handler and stores its response (COMPLETED)
+  retry            gets the stored response back with Idempotent-Replayed:
+                   true, and nothing is written again
+  concurrent retry 409 while the first request is still running
+  key reuse        422 when the same key arrives with a different body
+
+Keys are scoped per handler and per caller (Cognito email), so two users
+cannot collide. Responses with a 5xx status are not stored; the key is
+released so the client can retry. That is only safe because the wrapped
+handlers answer 5xx solely for failures before their write commits: the
+steps after it (chain head, listing version bump) log their errors instead
+of raising. A claim whose handler died mid-flight
+can be taken over after IDEMPOTENCY_LOCK_SECONDS.
+
+Table: GrainIdempotencyKeys (partition key IdempotencyKey, string) with
+DynamoDB TTL enabled on ExpiresAt; records live IDEMPOTENCY_TTL seconds.
+Requests without the header run exactly as before.
+"""
+import os
+import json
+import time
+import hashlib
+from functools import wraps
+import boto3
+from botocore.exceptions import ClientError
+
+IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', '86400'))
+IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', '60'))
+MAX_KEY_LENGTH = 255
+
+keys_table = boto3.resource('dynamodb').Table(os.environ.get('IDEMPOTENCY_TABLE', 'GrainIdempotencyKeys'))
+
+HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
+    'Access-Control-Allow-Methods': 'OPTIONS,POST'
+}
+
+def request_key(event):
+    """The Idempotency-Key header, or None"""
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == 'idempotency-key':
+            return value.strip() if isinstance(value, str) else None
+    return None
+
+def caller_id(event):
+    claims = event.get('requestContext', {}).get('authorizer', {}).get('claims', {})
+    return (claims.get('email') or claims.get('sub') or 'anonymous').lower()
+
+def fingerprint(event):
+    """Digest of the request body, to catch a key reused for a different request"""
+    body = event.get('body')
+    if not isinstance(body, str):
+        body = json.dumps(body, sort_keys=True, default=str)
+    return hashlib.sha256((body or '').encode()).hexdigest()
+
+def _reply(status, message):
+    return {'statusCode': status, 'headers': HEADERS, 'body': json.dumps({'error': message})}
+
+def claim(record_key, digest, attempts=2):
+    """Take the key for this request; returns None, or the existing record if already taken"""
+    now = int(time.time())
+    try:
+        keys_table.put_item(
+            Item={
+                'IdempotencyKey': record_key,
+                'Status': 'IN_PROGRESS',
+                'Fingerprint': digest,
+                'LockExpiresAt': now + IDEMPOTENCY_LOCK_SECONDS,
+                'ExpiresAt': now + IDEMPOTENCY_TTL
+            },
+            # TTL deletion lags, so treat expired records and abandoned claims as free
+            ConditionExpression='attribute_not_exists(IdempotencyKey) OR ExpiresAt < :now '
+                                'OR (#status = :in_progress AND LockExpiresAt < :now)',
+            ExpressionAttributeNames={'#status': 'Status'},
+            ExpressionAttributeValues={':now': now, ':in_progress': 'IN_PROGRESS'}
+        )
+        return None
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+    existing = keys_table.get_item(Key={'IdempotencyKey': record_key}, ConsistentRead=True).get('Item')
+    if existing is None and attempts > 1:
+        # Released between the put and the read; try to take it again
+        return claim(record_key, digest, attempts - 1)
+    return existing or {'Status': 'IN_PROGRESS', 'Fingerprint': digest}
+
+def complete(record_key, response):
+    keys_table.update_item(
+        Key={'IdempotencyKey': record_key},
+        UpdateExpression='SET #status = :completed, #response = :response REMOVE LockExpiresAt',
+        ExpressionAttributeNames={'#status': 'Status', '#response': 'Response'},
+        ExpressionAttributeValues={':completed': 'COMPLETED', ':response': json.dumps(response)}
+    )
+
+def release(record_key):
+    keys_table.delete_item(Key={'IdempotencyKey': record_key})
+
+def idempotent(scope):
+    """Decorator for a Lambda handler that must not repeat its write on retry"""
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(event, context):
+            key = request_key(event)
+            if not key:
+                return handler(event, context)
+            if len(key) > MAX_KEY_LENGTH:
+                return _reply(400, f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters')
+
+            record_key = f"{scope}#{caller_id(event)}#{key}"
+            digest = fingerprint(event)
+            try:
+                existing = claim(record_key, digest)
+            except ClientError as e:
+                # Losing dedup for one request beats failing the write outright
+                print(f"WARNING: idempotency store unavailable, running without it: {str(e)}")
+                return handler(event, context)
+
+            if existing is not None:
+                if existing.get('Fingerprint') != digest:
+                    return _reply(422, 'Idempotency-Key was already used for a different request')
+                if existing.get('Status') == 'COMPLETED':
+                    print(f"Replaying stored response for idempotency key {key}")
+                    response = json.loads(existing['Response'])
+                    response['headers'] = dict(response.get('headers') or {}, **{'Idempotent-Replayed': 'true'})
+                    return response
+                return _reply(409, 'A request with this Idempotency-Key is still in progress')
+
+            try:
+                response = handler(event, context)
+            except Exception:
+                release(record_key)
+                raise
+            try:
+                if int(response.get('statusCode', 500)) >= 500:
+                    release(record_key)
+                else:
+                    complete(record_key, response)
+            except ClientError as e:
+                # The write already happened; answer the client and let the claim time out
+                print(f"WARNING: could not record idempotency key {key}: {str(e)}")
+            return response
+        return wrapper
+    return decorator
@@ -1,94 +1,124 @@
 import json
-import boto3
+import time
+import random
 import hashlib
 from datetime import datetime
-from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from boto3.dynamodb.types import TypeDeserializer
+from item_codec import client, batch_get_items, serialize_values
+from chain_heads import titles_table, record_chain_head, bump_table_version
+
+HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*'
+}
+
+# Conditional updates in flight at once, and how hard to retry a throttled one
+PURCHASE_WORKERS = 16
+UPDATE_ATTEMPTS = 6
+UPDATE_BASE_BACKOFF = 0.05
+UPDATE_MAX_BACKOFF = 2.0
+THROTTLE_CODES = ('ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded')
+
+_deserializer = TypeDeserializer()
+
+def issue_title(item, buyer_name):
+    """Mark one ForSale title as issued to buyer_name; returns the updated record"""
+    # Generate new final title hash
+    timestamp = int(datetime.now().timestamp())
+    hash_data = f"{item['TitleHash']}{item['PreviousHash']}{buyer_name}{timestamp}"
+    final_title_hash = hashlib.sha256(hash_data.encode()).hexdigest()
+
+    for attempt in range(UPDATE_ATTEMPTS):
+        try:
+            response = client.update_item(
+                TableName=titles_table.name,
+                Key=serialize_values({'TitleHash': item['TitleHash']}),
+                UpdateExpression='SET #status = :status, BuyerName = :buyer_name, BuyerId = :buyer_id, FinalTitleHash = :final_hash, #ts = :timestamp',
+                ExpressionAttributeNames={
+                    '#status': 'Status',
+                    '#ts': 'Timestamp'
+                },
+                ExpressionAttributeValues=serialize_values({
+                    ':status': 'TitleIssued',
+                    ':buyer_name': buyer_name,
+                    ':buyer_id': 'B001',
+                    ':final_hash': final_title_hash,
+                    ':timestamp': timestamp,
+                    ':old_status': 'ForSale'
+                }),
+                ConditionExpression='#status = :old_status',
+                ReturnValues='ALL_NEW'
+            )
+            break
+        except ClientError as e:
+            if e.response['Error']['Code'] not in THROTTLE_CODES or attempt == UPDATE_ATTEMPTS - 1:
+                raise
+            time.sleep(min(UPDATE_MAX_BACKOFF, UPDATE_BASE_BACKOFF * 2 ** attempt) * random.random())
+
+    updated = {k: _deserializer.deserialize(v) for k, v in response['Attributes'].items()}
+    # Keep the chain head projection in step with the new status
+    record_chain_head(updated, bump=False)
+    return updated
+
+def purchase_one(title_hash, item, buyer_name):
+    """Error message for one title, or None if it was issued"""
+    if item is None:
+        return f"Item with hash {title_hash} not found"
+    try:
+        issue_title(item, buyer_name)
+        return None
+    except ClientError as ex:
+        if ex.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return f"Error updating {title_hash}: title is no longer for sale"
+        return f"Error updating {title_hash}: {str(ex)}"
+    except Exception as ex:
+        return f"Error updating {title_hash}: {str(ex)}"
 
 def handler(event, context):
     try:
         body = json.loads(event.get('body', '{}'))
         hashes = body.get('hashes', [])
         buyer_name = body.get('buyer_name', '')
-        
+
         if not hashes or not buyer_name:
             return {
                 'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
+                'headers': HEADERS,
                 'body': json.dumps({'error': 'Missing hashes or buyer_name'})
             }
-        
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table('GrainTitles')
-        
-        updated_count = 0
-        errors = []
-        
-        for title_hash in hashes:
-            try:
-                # Get the current item
-                response = table.get_item(Key={'TitleHash': title_hash})
-                
-                if 'Item' not in response:
-                    errors.append(f"Item with hash {title_hash} not found")
-                    continue
-                
-                item = response['Item']
-                
-                # Generate new final title hash
-                timestamp = int(datetime.now().timestamp())
-                hash_data = f"{item['TitleHash']}{item['PreviousHash']}{buyer_name}{timestamp}"
-                final_title_hash = hashlib.sha256(hash_data.encode()).hexdigest()
-                
-                # Update the item
-                table.update_item(
-                    Key={'TitleHash': title_hash},
-                    UpdateExpression='SET #status = :status, BuyerName = :buyer_name, BuyerId = :buyer_id, FinalTitleHash = :final_hash, #ts = :timestamp',
-                    ExpressionAttributeNames={
-                        '#status': 'Status',
-                        '#ts': 'Timestamp'
-                    },
-                    ExpressionAttributeValues={
-                        ':status': 'TitleIssued',
-                        ':buyer_name': buyer_name,
-                        ':buyer_id': 'B001',
-                        ':final_hash': final_title_hash,
-                        ':timestamp': timestamp,
-                        ':old_status': 'ForSale'
-                    },
-                    ConditionExpression='#status = :old_status'
-                )
-                
-                updated_count += 1
-                
-            except Exception as ex:
-                errors.append(f"Error updating {title_hash}: {str(ex)}")
-        
+
+        # Drop repeats so a title is never updated twice in one request
+        hashes = list(dict.fromkeys(hashes))
+
+        # One consistent batch read for every title, then the conditional updates in parallel
+        items = batch_get_items(titles_table.name, 'TitleHash', hashes, ConsistentRead=True)
+        with ThreadPoolExecutor(max_workers=min(PURCHASE_WORKERS, len(hashes))) as executor:
+            outcomes = list(executor.map(lambda pair: purchase_one(pair[0], pair[1], buyer_name), zip(hashes, items)))
+
+        errors = [message for message in outcomes if message]
+        updated_count = len(outcomes) - len(errors)
+        if updated_count:
+            bump_table_version()
+
         return {
             'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
+            'headers': HEADERS,
             'body': json.dumps({
                 'success': True,
                 'updated': updated_count,
                 'errors': errors
             })
         }
-        
+
     except Exception as ex:
         print(f"Error: {str(ex)}")
         return {
             'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
+            'headers': HEADERS,
             'body': json.dumps({
                 'error': str(ex),
                 'type': type(ex).__name__
             })
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,184 @@
+"""Decimal-free item codec for read paths.
+
+The boto3 resource layer turns every DynamoDB number into a Decimal, and each
+handler then needed its own DecimalEncoder to turn it back into a float while
+encoding JSON. For reads that only feed a response, item_to_native() converts
+the low-level client's wire format ({'N': '4.5'}, {'S': 'Corn'}, ...) straight
+into JSON-ready Python types in one pass: integers stay int, other numbers
+become float.
+
+query_items(), query_page() and batch_get_items() wrap the client calls the
+read handlers need and return items already decoded.
+
+Writes keep using the resource layer (it needs Decimal). json_default() is
+the shared fallback for any Decimal that still reaches json.dumps().
+
+Run this module directly for a micro-benchmark against the old path.
+"""
+import json
+import time
+import base64
+import random
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from boto3.dynamodb.types import TypeSerializer
+
+client = boto3.client('dynamodb')
+
+BATCH_GET_SIZE = 100
+BATCH_GET_WORKERS = 8
+BATCH_GET_ATTEMPTS = 8
+BATCH_GET_BASE_BACKOFF = 0.05
+BATCH_GET_MAX_BACKOFF = 2.0
+
+_serializer = TypeSerializer()
+
+def _number(text):
+    if '.' in text or 'e' in text or 'E' in text:
+        return float(text)
+    return int(text)
+
+def from_wire(value):
+    """Convert one DynamoDB AttributeValue to a native Python value"""
+    (kind, data), = value.items()
+    if kind == 'S':
+        return data
+    if kind == 'N':
+        return _number(data)
+    if kind == 'M':
+        return {k: from_wire(v) for k, v in data.items()}
+    if kind == 'L':
+        return [from_wire(v) for v in data]
+    if kind == 'BOOL':
+        return data
+    if kind == 'NULL':
+        return None
+    if kind == 'SS':
+        return list(data)
+    if kind == 'NS':
+        return [_number(n) for n in data]
+    if kind == 'B':
+        return base64.b64encode(data).decode('ascii')
+    if kind == 'BS':
+        return [base64.b64encode(b).decode('ascii') for b in data]
+    raise TypeError(f'Unsupported DynamoDB type {kind}')
+
+def item_to_native(item):
+    native = {}
+    for key, value in item.items():
+        # Strings and numbers are almost every attribute; skip the dispatch
+        if 'S' in value:
+            native[key] = value['S']
+        elif 'N' in value:
+            native[key] = _number(value['N'])
+        else:
+            native[key] = from_wire(value)
+    return native
+
+def serialize_values(values):
+    """Wire-encode a dict of plain Python values (ExpressionAttributeValues or a whole item)"""
+    return {k: _serializer.serialize(v) for k, v in values.items()}
+
+def query_items(table_name, **query_kwargs):
+    """Yield native items for a low-level client query, following LastEvaluatedKey"""
+    if 'ExpressionAttributeValues' in query_kwargs:
+        query_kwargs['ExpressionAttributeValues'] = serialize_values(query_kwargs['ExpressionAttributeValues'])
+    response = client.query(TableName=table_name, **query_kwargs)
+    yield from (item_to_native(i) for i in response.get('Items', []))
+    while 'LastEvaluatedKey' in response:
+        response = client.query(TableName=table_name, ExclusiveStartKey=response['LastEvaluatedKey'], **query_kwargs)
+        yield from (item_to_native(i) for i in response.get('Items', []))
+
+def query_page(table_name, limit, start_key=None, **query_kwargs):
+    """One page of a low-level client query: (native items, wire LastEvaluatedKey or None)"""
+    if 'ExpressionAttributeValues' in query_kwargs:
+        query_kwargs['ExpressionAttributeValues'] = serialize_values(query_kwargs['ExpressionAttributeValues'])
+    if start_key:
+        query_kwargs['ExclusiveStartKey'] = start_key
+    response = client.query(TableName=table_name, Limit=limit, **query_kwargs)
+    return [item_to_native(i) for i in response.get('Items', [])], response.get('LastEvaluatedKey')
+
+def _batch_get_chunk(table_name, key_name, values, projection_kwargs):
+    request = {table_name: dict(projection_kwargs, Keys=[{key_name: {'S': v}} for v in values])}
+    found = {}
+    for attempt in range(BATCH_GET_ATTEMPTS):
+        response = client.batch_get_item(RequestItems=request)
+        for item in response.get('Responses', {}).get(table_name, []):
+            native = item_to_native(item)
+            found[native[key_name]] = native
+        request = response.get('UnprocessedKeys') or {}
+        if not request:
+            return found
+        # Throttled or over the response size limit; back off with jitter and retry the rest
+        time.sleep(min(BATCH_GET_MAX_BACKOFF, BATCH_GET_BASE_BACKOFF * 2 ** attempt) * random.random())
+    raise RuntimeError(f"BatchGetItem left {len(request[table_name]['Keys'])} keys unprocessed after {BATCH_GET_ATTEMPTS} attempts")
+
+def batch_get_items(table_name, key_name, values, max_workers=BATCH_GET_WORKERS, **projection_kwargs):
+    """Native items for string keys, in the order given (None where missing).
+
+    Keys are fetched in BatchGetItem calls of 100 running in parallel. A
+    ProjectionExpression, if given, must include key_name.
+    """
+    unique = list(dict.fromkeys(values))
+    chunks = [unique[i:i + BATCH_GET_SIZE] for i in range(0, len(unique), BATCH_GET_SIZE)]
+    found = {}
+    if chunks:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            for part in executor.map(lambda chunk: _batch_get_chunk(table_name, key_name, chunk, projection_kwargs), chunks):
+                found.update(part)
+    return [found.get(v) for v in values]
+
+def json_default(o):
+    """json.dumps default= hook for Decimals from the resource layer"""
+    if isinstance(o, Decimal):
+        return int(o) if o == o.to_integral_value() else float(o)
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+def _benchmark(count=10000, rounds=5):
+    from boto3.dynamodb.types import TypeDeserializer
+
+    class DecimalEncoder(json.JSONEncoder):
+        def default(self, o):
+            if isinstance(o, Decimal):
+                return float(o)
+            return super().default(o)
+
+    wire_items = []
+    for i in range(count):
+        wire_items.append({
+            'TitleHash': {'S': f'{i:064x}'},
+            'InitialHash': {'S': f'{i // 3:064x}'},
+            'CurrentHash': {'S': f'{i:064x}'},
+            'GrainType': {'S': ('Corn', 'Wheat', 'Soybean', 'Oats')[i % 4]},
+            'Quantity': {'N': str(100 + i % 900)},
+            'Price': {'N': f'{4 + (i % 250) / 100:.2f}'.rstrip('0').rstrip('.')},
+            'SellerID': {'S': f'seller{i % 97}@example.com'},
+            'BuyerID': {'S': 'NONE'},
+            'Status': {'S': 'ForSale'},
+            'TransferCount': {'N': str(i % 5)},
+            'Timestamp': {'N': str(1700000000 + i)},
+            'CreatedBy': {'S': f'seller{i % 89}@example.com'}
+        })
+
+    deserializer = TypeDeserializer()
+
+    def old_path():
+        items = [{k: deserializer.deserialize(v) for k, v in item.items()} for item in wire_items]
+        return json.dumps({'items': items}, cls=DecimalEncoder)
+
+    def new_path():
+        items = [item_to_native(item) for item in wire_items]
+        return json.dumps({'items': items})
+
+    for name, fn in [('TypeDeserializer + DecimalEncoder', old_path), ('item_codec', new_path)]:
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        print(f"{name:36s} {best * 1000:8.1f} ms for {count} items ({count / best:,.0f} items/s)")
+
+if __name__ == '__main__':
+    _benchmark()
@@ -0,0 +1,103 @@
+"""Merkle trees over each day's GrainTitles records.
+
+Leaves are the TitleHash values of the records hashed on one UTC day (the
+date part of HashTimestamp, which never changes after a record is written),
+sorted so anyone can rebuild the tree. Hashing follows RFC 6962:
+leaf = sha256(0x00 || hash), node = sha256(0x01 || left || right), and an
+odd node at the end of a level is carried up unchanged.
+
+A proof is the list of sibling hashes from the leaf to the root, so a
+verifier needs log2(n) hashes and the published root, not a table export.
+
+Roots live in GrainMerkleRoots (partition Day, sort Tree) where Tree is
+'all' or 'grain#<GrainType>'. Full tree levels are stored as JSON in S3
+under MERKLE_BUCKET, or under MERKLE_LOCAL_DIR when no bucket is set.
+"""
+import os
+import json
+import hashlib
+from bisect import bisect_left
+import boto3
+from botocore.exceptions import ClientError
+
+MERKLE_BUCKET = os.environ.get('MERKLE_BUCKET')
+MERKLE_LOCAL_DIR = os.environ.get('MERKLE_LOCAL_DIR', '/tmp/merkle')
+roots_table = boto3.resource('dynamodb').Table(os.environ.get('MERKLE_ROOTS_TABLE', 'GrainMerkleRoots'))
+s3 = boto3.client('s3')
+
+def leaf_hash(title_hash):
+    return hashlib.sha256(b'\x00' + bytes.fromhex(title_hash)).hexdigest()
+
+def node_hash(left, right):
+    return hashlib.sha256(b'\x01' + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+def build_levels(title_hashes):
+    """Tree levels from leaf hashes up to the root; title_hashes must be sorted"""
+    level = [leaf_hash(h) for h in title_hashes]
+    levels = [level]
+    while len(level) > 1:
+        level = [node_hash(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+                 for i in range(0, len(level), 2)]
+        levels.append(level)
+    return levels
+
+def build_proof(levels, index):
+    """Sibling hashes from leaf index to the root"""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append({'hash': level[sibling], 'side': 'left' if sibling < index else 'right'})
+        index //= 2
+    return proof
+
+def verify_proof(title_hash, proof, root):
+    current = leaf_hash(title_hash)
+    for step in proof:
+        if step['side'] == 'left':
+            current = node_hash(step['hash'], current)
+        else:
+            current = node_hash(current, step['hash'])
+    return current == root
+
+def tree_name(grain_type=None):
+    return f'grain#{grain_type}' if grain_type else 'all'
+
+def tree_key(day, tree):
+    return f"merkle/{day}/{tree.replace('#', '-')}.json"
+
+def save_tree(day, tree, title_hashes, levels):
+    key = tree_key(day, tree)
+    body = json.dumps({'day': day, 'tree': tree, 'leaves': title_hashes, 'levels': levels})
+    if MERKLE_BUCKET:
+        s3.put_object(Bucket=MERKLE_BUCKET, Key=key, Body=body.encode(), ContentType='application/json')
+    else:
+        path = os.path.join(MERKLE_LOCAL_DIR, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(body)
+    return key
+
+def load_tree(day, tree):
+    key = tree_key(day, tree)
+    if MERKLE_BUCKET:
+        try:
+            body = s3.get_object(Bucket=MERKLE_BUCKET, Key=key)['Body'].read()
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchKey':
+                return None
+            raise
+        return json.loads(body)
+    try:
+        with open(os.path.join(MERKLE_LOCAL_DIR, key)) as f:
+            return json.load(f)
+    except OSError:
+        return None
+
+def inclusion_proof(tree_data, title_hash):
+    """(leaf index, proof) for title_hash in a stored tree, or (None, None)"""
+    leaves = tree_data['leaves']
+    index = bisect_left(leaves, title_hash)
+    if index == len(leaves) or leaves[index] != title_hash:
+        return None, None
+    return index, build_proof(tree_data['levels'], index)
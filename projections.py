@@ -0,0 +1,39 @@
+"""Named attribute projections for listing responses.
+
+Listing endpoints only need the handful of attributes the dashboard renders.
+Asking DynamoDB for just those (ProjectionExpression) keeps HashChain and the
+duplicated timestamp attributes out of the read, the JSON encoding and the
+response. Full records stay available from grainApp-get-title.py.
+"""
+
+VIEWS = {
+    # Marketplace, my-titles and status listings
+    'listing': [
+        'TitleHash', 'CurrentHash', 'InitialHash', 'GrainType', 'Quantity',
+        'Price', 'SellerID', 'BuyerID', 'Status', 'TransferCount',
+        'Timestamp', 'CreatedBy'
+    ],
+    # Purchase listings also show who bought the title
+    'purchase': [
+        'TitleHash', 'CurrentHash', 'InitialHash', 'GrainType', 'Quantity',
+        'Price', 'SellerID', 'BuyerId', 'BuyerName', 'Status',
+        'TransferCount', 'Timestamp', 'FinalTitleHash'
+    ]
+}
+
+def projection_kwargs(view, **kwargs):
+    """Add the ProjectionExpression for view to scan/query kwargs.
+
+    Every attribute goes through an ExpressionAttributeNames placeholder so
+    reserved words such as Status and Timestamp need no special casing.
+    Existing ExpressionAttributeNames in kwargs are kept.
+    """
+    names = dict(kwargs.get('ExpressionAttributeNames', {}))
+    placeholders = []
+    for i, attribute in enumerate(VIEWS[view]):
+        placeholder = f'#p{i}'
+        names[placeholder] = attribute
+        placeholders.append(placeholder)
+    kwargs['ProjectionExpression'] = ', '.join(placeholders)
+    kwargs['ExpressionAttributeNames'] = names
+    return kwargs
@@ -1,18 +1,14 @@
 import json
 import boto3
-import hashlib
-from datetime import datetime
-from decimal import Decimal
-from collections import defaultdict
+from title_relist import commit_relist, relist_error
+from title_transfer import TransferConflict
+from item_codec import json_default
+from idempotency import idempotent
+from write_pipeline import wants_async, async_available, enqueue
 
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table('GrainTitles')
 
-def decimal_default(obj):
-    if isinstance(obj, Decimal):
-        return float(obj)
-    raise TypeError
-
 def get_user_info(event):
     try:
         claims = event.get('requestContext', {}).get('authorizer', {}).get('claims', {})
@@ -39,6 +35,7 @@ def get_user_info(event):
         print(f"Error extracting user info: {str(e)}")
         return None
 
+@idempotent('relist-title')
 def lambda_handler(event, context):
     try:
         user_info = get_user_info(event)
@@ -47,7 +44,7 @@ def lambda_handler(event, context):
                 'statusCode': 401,
                 'headers': {
                     'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                     'Access-Control-Allow-Methods': 'OPTIONS,POST'
                 },
                 'body': json.dumps({'error': 'Unauthorized'})
@@ -73,7 +70,7 @@ def lambda_handler(event, context):
                 'statusCode': 400,
                 'headers': {
                     'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                     'Access-Control-Allow-Methods': 'OPTIONS,POST'
                 },
                 'body': json.dumps({'error': 'Missing title_hash'})
@@ -84,7 +81,7 @@ def lambda_handler(event, context):
                 'statusCode': 400,
                 'headers': {
                     'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                     'Access-Control-Allow-Methods': 'OPTIONS,POST'
                 },
                 'body': json.dumps({'error': 'Missing new_price'})
@@ -101,7 +98,7 @@ def lambda_handler(event, context):
                 'statusCode': 404,
                 'headers': {
                     'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                     'Access-Control-Allow-Methods': 'OPTIONS,POST'
                 },
                 'body': json.dumps({'error': 'Title not found'})
@@ -109,108 +106,76 @@ def lambda_handler(event, context):
         
         current_title = response['Item']
         
-        # Check ownership
-        seller_id = (current_title.get('SellerID') or '').lower()
-        status = current_title.get('Status', '')
-        
-        if seller_id != user_email.lower():
+        # Owner, not already for sale, not already superseded by an earlier relist
+        error = relist_error(current_title, user_email)
+        if error:
             return {
-                'statusCode': 403,
+                'statusCode': error[0],
                 'headers': {
                     'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                     'Access-Control-Allow-Methods': 'OPTIONS,POST'
                 },
-                'body': json.dumps({'error': 'You do not own this title'})
+                'body': json.dumps({'error': error[1]})
             }
         
-        if status == 'ForSale':
+        # Async mode: queue the write behind any others on this chain and answer with a ticket
+        if wants_async(event, body):
+            if not async_available():
+                return {
+                    'statusCode': 503,
+                    'headers': {
+                        'Access-Control-Allow-Origin': '*',
+                        'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
+                        'Access-Control-Allow-Methods': 'OPTIONS,POST'
+                    },
+                    'body': json.dumps({'error': 'Async writes are not available; retry without async'})
+                }
+            ticket_id = enqueue('relist', current_title.get('InitialHash', title_hash), title_hash, user_email, {
+                'title_hash': title_hash,
+                'owner_id': user_email,
+                'owner_name': user_name,
+                'owner_sub': user_sub,
+                'price_string': price_string
+            })
             return {
-                'statusCode': 400,
+                'statusCode': 202,
                 'headers': {
                     'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                     'Access-Control-Allow-Methods': 'OPTIONS,POST'
                 },
-                'body': json.dumps({'error': 'Title is already for sale'})
+                'body': json.dumps({
+                    'message': 'Relist queued',
+                    'ticket_id': ticket_id,
+                    'status': 'QUEUED',
+                    'status_url': f'/write-status?ticket_id={ticket_id}',
+                    'old_hash': title_hash,
+                    'new_price': price_float
+                })
             }
         
-        # Get values from current record
-        grain_type = current_title.get('GrainType')
-        quantity = int(current_title.get('Quantity', 0))
-        initial_hash = current_title.get('InitialHash', title_hash)
-        current_hash = current_title.get('CurrentHash', title_hash)
-        hash_chain = current_title.get('HashChain', [title_hash])
-        current_transfer_count = int(current_title.get('TransferCount', 0))
-        
-        # NEW transfer count for the relist record
-        new_transfer_count = current_transfer_count + 1
-        
-        # Generate timestamp
-        timestamp = int(datetime.utcnow().timestamp())
-        timestamp_iso = datetime.utcnow().isoformat()
-        
-        # Calculate new hash (includes previous hash for chain integrity)
-        hash_input = f"{current_hash}{grain_type}{quantity}{user_email}{price_string}{timestamp_iso}{new_transfer_count}"
-        new_hash = hashlib.sha256(hash_input.encode()).hexdigest()
-        
-        print(f"Hash input: {hash_input}")
-        print(f"New hash: {new_hash}")
-        print(f"Transfer count: {new_transfer_count}")
-        
-        # Update hash chain
-        new_hash_chain = hash_chain + [new_hash]
-        
-        # STEP 1: Mark the OLD record as "Listed" (it's been relisted)
-        table.update_item(
-            Key={'TitleHash': title_hash},
-            UpdateExpression='SET #status = :status, RelistedAt = :timestamp, RelistedAtISO = :timestamp_iso',
-            ExpressionAttributeNames={'#status': 'Status'},
-            ExpressionAttributeValues={
-                ':status': 'Purchased',
-                ':timestamp': timestamp,
-                ':timestamp_iso': timestamp_iso
+        try:
+            new_item = commit_relist(current_title, user_email, user_name, user_sub, price_string)
+        except TransferConflict as e:
+            print(f"Relist conflict on {title_hash}: {e} {e.reasons}")
+            return {
+                'statusCode': 409,
+                'headers': {
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
+                    'Access-Control-Allow-Methods': 'OPTIONS,POST'
+                },
+                'body': json.dumps({'error': str(e)})
             }
-        )
-        
-        # STEP 2: Create NEW record with new hash (blockchain style!)
-        new_item = {
-            'TitleHash': new_hash,
-            'InitialHash': initial_hash,
-            'CurrentHash': new_hash,
-            'PreviousHash': current_hash,
-            'HashChain': new_hash_chain,
-            'GrainType': grain_type,
-            'Quantity': quantity,
-            'Price': Decimal(price_string),
-            'PriceString': price_string,
-            'SellerID': user_email,
-            'SellerName': user_name,
-            'SellerSub': user_sub,
-            'BuyerID': 'NONE',
-            'BuyerName': 'NONE',
-            'BuyerSub': 'NONE',
-            'Status': 'ForSale',
-            'TransferCount': new_transfer_count,
-            'HashTimestamp': timestamp_iso,
-            'Timestamp': timestamp,
-            'TimestampISO': timestamp_iso,
-            'CreatedBy': current_title.get('CreatedBy', user_email),
-            'CreatedBySub': current_title.get('CreatedBySub', ''),
-            'CreatedByUsername': current_title.get('CreatedByUsername', ''),
-            'RelistedBy': user_email,
-            'RelistedFrom': title_hash
-        }
-        
-        table.put_item(Item=new_item)
-        
-        print(f"Created new ForSale record with hash {new_hash}")
+        new_hash = new_item['TitleHash']
+        new_transfer_count = new_item['TransferCount']
         
         return {
             'statusCode': 200,
             'headers': {
                 'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                 'Access-Control-Allow-Methods': 'OPTIONS,POST'
             },
             'body': json.dumps({
@@ -220,7 +185,7 @@ def lambda_handler(event, context):
                 'new_price': price_float,
                 'transfer_count': new_transfer_count,
                 'status': 'ForSale'
-            }, default=decimal_default)
+            }, default=json_default)
         }
         
     except Exception as e:
@@ -231,7 +196,7 @@ def lambda_handler(event, context):
             'statusCode': 500,
             'headers': {
                 'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
                 'Access-Control-Allow-Methods': 'OPTIONS,POST'
             },
             'body': json.dumps({'error': str(e)})
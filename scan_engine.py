@@ -0,0 +1,109 @@
+"""Parallel segmented scans for the full-table handlers.
+
+ParallelScan splits a table scan into Segment/TotalSegments slices and runs
+them on a thread pool through the (thread-safe) low-level client. Pages are
+merged into a single stream as they arrive, so callers can start reducing
+before the slowest segment finishes. Items are decoded with item_codec into
+native int/float values; pass native=False to get the resource layer's
+Decimal shape instead (needed when items are written back).
+
+SCAN_SEGMENTS sets the default parallelism. After iteration finishes,
+segment_timings holds pages, items and seconds for every segment.
+"""
+import os
+import time
+import queue
+import threading
+import boto3
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.types import TypeDeserializer
+from item_codec import item_to_native, serialize_values
+
+SCAN_SEGMENTS = int(os.environ.get('SCAN_SEGMENTS', '4'))
+
+client = boto3.client('dynamodb')
+_deserializer = TypeDeserializer()
+
+def _decimal_item(item):
+    return {k: _deserializer.deserialize(v) for k, v in item.items()}
+
+class ParallelScan:
+    def __init__(self, table_name, segments=None, max_workers=None, native=True, **scan_kwargs):
+        self.table_name = table_name
+        self.decode = item_to_native if native else _decimal_item
+        self.segments = segments or SCAN_SEGMENTS
+        self.max_workers = max_workers or self.segments
+        self.scan_kwargs = dict(scan_kwargs)
+        if 'ExpressionAttributeValues' in self.scan_kwargs:
+            self.scan_kwargs['ExpressionAttributeValues'] = serialize_values(
+                self.scan_kwargs['ExpressionAttributeValues'])
+        self.segment_timings = {}
+
+    def _put(self, results, stop, message):
+        while not stop.is_set():
+            try:
+                results.put(message, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _scan_segment(self, segment, results, stop):
+        started = time.perf_counter()
+        pages = 0
+        items = 0
+        try:
+            kwargs = dict(self.scan_kwargs, TableName=self.table_name,
+                          Segment=segment, TotalSegments=self.segments)
+            while True:
+                response = client.scan(**kwargs)
+                page = [self.decode(item) for item in response.get('Items', [])]
+                pages += 1
+                items += len(page)
+                if not self._put(results, stop, ('page', segment, page)):
+                    return
+                if 'LastEvaluatedKey' not in response:
+                    break
+                kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+            self._put(results, stop, ('done', segment, {
+                'pages': pages,
+                'items': items,
+                'seconds': round(time.perf_counter() - started, 4)
+            }))
+        except Exception as e:
+            self._put(results, stop, ('error', segment, e))
+
+    def pages(self):
+        """Yield item pages from all segments in arrival order"""
+        results = queue.Queue(maxsize=self.segments * 2)
+        stop = threading.Event()
+        started = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            for segment in range(self.segments):
+                executor.submit(self._scan_segment, segment, results, stop)
+            remaining = self.segments
+            while remaining:
+                kind, segment, payload = results.get()
+                if kind == 'page':
+                    yield payload
+                elif kind == 'done':
+                    self.segment_timings[segment] = payload
+                    remaining -= 1
+                else:
+                    raise payload
+            total_items = sum(t['items'] for t in self.segment_timings.values())
+            slowest = max(t['seconds'] for t in self.segment_timings.values())
+            print(f"Scanned {total_items} items from {self.table_name} in {self.segments} segments "
+                  f"({time.perf_counter() - started:.3f}s, slowest segment {slowest:.3f}s)")
+        finally:
+            stop.set()
+            executor.shutdown(wait=False)
+
+    def __iter__(self):
+        for page in self.pages():
+            yield from page
+
+def parallel_scan(table_name, segments=None, max_workers=None, native=True, **scan_kwargs):
+    """Scan table_name in parallel segments; iterate the result for items"""
+    return ParallelScan(table_name, segments=segments, max_workers=max_workers, native=native, **scan_kwargs)
@@ -0,0 +1,55 @@
+import hashlib
+from title_hashing import hash_input, hash_matches
+from validation_cache import ValidationCache, LocalStore, fields_digest
+
+def make_record():
+    record = {
+        'TitleHash': '',
+        'GrainType': 'Wheat',
+        'Quantity': 100,
+        'PriceString': '250.00',
+        'SellerID': 'farmer@example.com',
+        'Status': 'ForSale',
+        'TransferCount': 0,
+        'HashTimestamp': '2026-01-01T00:00:00'
+    }
+    record['CurrentHash'] = hashlib.sha256(hash_input(record).encode()).hexdigest()
+    record['TitleHash'] = record['CurrentHash']
+    return record
+
+def validate(cache, records, title_hash):
+    """What grainApp-validate-hash.py does for a single record"""
+    entry, tier = cache.lookup(title_hash, records.get)
+    if entry:
+        return entry['Valid'], tier
+    record = records[title_hash]
+    valid = hash_matches(record)
+    cache.put(title_hash, fields_digest(record), valid)
+    return valid, None
+
+def test_persistent_hit_for_unchanged_record(tmp_path):
+    record = make_record()
+    records = {record['TitleHash']: record}
+    path = str(tmp_path / 'cache.json')
+
+    assert validate(ValidationCache(LocalStore(path)), records, record['TitleHash']) == (True, None)
+    # A new container only has the persistent tier
+    assert validate(ValidationCache(LocalStore(path)), records, record['TitleHash']) == (True, 'persistent')
+
+def test_record_changed_after_caching_is_invalid(tmp_path):
+    record = make_record()
+    records = {record['TitleHash']: record}
+    path = str(tmp_path / 'cache.json')
+    assert validate(ValidationCache(LocalStore(path)), records, record['TitleHash']) == (True, None)
+
+    record['Quantity'] = 1000
+    assert validate(ValidationCache(LocalStore(path)), records, record['TitleHash']) == (False, None)
+    # The re-computed verdict replaced the stale one
+    assert validate(ValidationCache(LocalStore(path)), records, record['TitleHash']) == (False, 'persistent')
+
+def test_deleted_record_is_a_miss(tmp_path):
+    record = make_record()
+    path = str(tmp_path / 'cache.json')
+    validate(ValidationCache(LocalStore(path)), {record['TitleHash']: record}, record['TitleHash'])
+
+    assert ValidationCache(LocalStore(path)).lookup(record['TitleHash'], {}.get) == (None, None)
@@ -0,0 +1,49 @@
+"""Hash formulas for GrainTitles records.
+
+Shared by grainApp-validate-hash.py and the chain_audit.py batch job so both
+re-compute CurrentHash the same way. Only plain str/int work happens here,
+which keeps the functions cheap to run in worker processes.
+"""
+import hashlib
+
+# Attributes the formulas read, for ProjectionExpression on bulk reads
+HASH_FIELDS = (
+    'TitleHash', 'CurrentHash', 'PreviousHash', 'InitialHash', 'GrainType', 'Quantity',
+    'PriceString', 'SellerID', 'Status', 'TransferCount', 'RelistCount',
+    'HashTimestamp', 'TimestampISO', 'RelistedAtISO', 'LastTransferTimestampISO'
+)
+
+def hash_input(item):
+    """The string a record's CurrentHash was computed from"""
+    grain = item['GrainType']
+    qty = int(item['Quantity'])
+    price = item['PriceString']
+    transfer_count = int(item.get('TransferCount', 0))
+    relist_count = int(item.get('RelistCount', 0))
+    seller_id = item.get('SellerID', '')
+    status = item.get('Status', '')
+
+    if transfer_count == 0 and relist_count == 0:
+        # Original creation hash format:
+        # hash_input = f"{grain_type}{quantity}{seller_id}{price_string}{timestamp}"
+        timestamp = item.get('HashTimestamp') or item.get('TimestampISO')
+        return f"{grain}{qty}{seller_id}{price}{timestamp}"
+    if relist_count > 0 and status == 'ForSale':
+        # Relist hash format:
+        # hash_input = f"{previous_hash}{grain_type}{quantity}{owner_id}{price}{timestamp_iso}{transfer_count}R{relist_count}"
+        prev = item.get('PreviousHash', '')
+        timestamp = item.get('HashTimestamp') or item.get('RelistedAtISO', '')
+        return f"{prev}{grain}{qty}{seller_id}{price}{timestamp}{transfer_count}R{relist_count}"
+    # Transfer hash format - SellerID is the buyer who just received this
+    # hash_input = f"{previous_hash}{grain_type}{quantity}{buyer_id}{price}{timestamp_iso}{transfer_count}"
+    prev = item.get('PreviousHash', '')
+    # HashTimestamp is the time that went into the hash; LastTransferTimestampISO is
+    # overwritten when a relisted record is later sold, so it is only a fallback
+    timestamp = item.get('HashTimestamp') or item.get('LastTransferTimestampISO', '')
+    return f"{prev}{grain}{qty}{seller_id}{price}{timestamp}{transfer_count}"
+
+def compute_hash(item):
+    return hashlib.sha256(hash_input(item).encode()).hexdigest()
+
+def hash_matches(item):
+    return compute_hash(item) == item.get('CurrentHash')
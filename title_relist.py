@@ -0,0 +1,141 @@
+"""Relisting a title the caller owns.
+
+The owner's current record is marked Purchased and a new ForSale record is
+chained after it with a fresh hash and the new price. Both writes and the
+chain head move in one TransactWriteItems call:
+
+  1. Update the old record, conditional on it still being the caller's,
+     not for sale, not already relisted and at the CurrentHash read
+  2. Put the new record, conditional on its TitleHash not existing
+  3. Put the chain head, conditional on it not being past this link
+
+so a repeated or concurrent relist of the same record cannot fork the
+chain; the loser gets title_transfer.TransferConflict. Shared by
+relist_title.py and the async write worker.
+"""
+import hashlib
+from datetime import datetime
+from decimal import Decimal
+from item_codec import serialize_values
+from chain_heads import titles_table, chain_head_put, try_bump_table_version
+from chain_format import link_fields
+from title_transfer import commit
+
+def relist_error(current_title, owner_id):
+    """(status code, message) if owner_id may not relist current_title, else None"""
+    if (current_title.get('SellerID') or '').lower() != owner_id.lower():
+        return 403, 'You do not own this title'
+    if current_title.get('Status', '') == 'ForSale':
+        return 400, 'Title is already for sale'
+    # Already superseded by an earlier relist; the chain continues from the newer record
+    if current_title.get('Status') == 'Purchased' or 'RelistedAt' in current_title:
+        return 409, 'Title has already been relisted'
+    return None
+
+def relist_transaction(current_title, new_item, timestamp, timestamp_iso):
+    """TransactItems committing one relist"""
+    condition = ('#status <> :purchased AND #status <> :for_sale AND SellerID = :owner '
+                 'AND attribute_not_exists(RelistedAt)')
+    values = {
+        ':status': 'Purchased',
+        ':timestamp': timestamp,
+        ':timestamp_iso': timestamp_iso,
+        ':purchased': 'Purchased',
+        ':for_sale': 'ForSale',
+        ':owner': current_title.get('SellerID', '')
+    }
+    if 'CurrentHash' in current_title:
+        condition += ' AND CurrentHash = :expected_hash'
+        values[':expected_hash'] = current_title['CurrentHash']
+    return [
+        {
+            'Update': {
+                'TableName': titles_table.name,
+                'Key': serialize_values({'TitleHash': current_title['TitleHash']}),
+                'UpdateExpression': 'SET #status = :status, RelistedAt = :timestamp, RelistedAtISO = :timestamp_iso',
+                'ConditionExpression': condition,
+                'ExpressionAttributeNames': {'#status': 'Status'},
+                'ExpressionAttributeValues': serialize_values(values)
+            }
+        },
+        {
+            'Put': {
+                'TableName': titles_table.name,
+                'Item': serialize_values(new_item),
+                'ConditionExpression': 'attribute_not_exists(TitleHash)'
+            }
+        },
+        chain_head_put(new_item)
+    ]
+
+def commit_relist(current_title, owner_id, owner_name, owner_sub, price_string, ticket_id=None):
+    """Relist current_title at price_string; returns the new ForSale record.
+
+    Raises title_transfer.TransferConflict if the record changed since it was
+    read. An async write's ticket_id is stored on the new record as WriteTicket.
+    """
+    title_hash = current_title['TitleHash']
+
+    # Get values from current record
+    grain_type = current_title.get('GrainType')
+    quantity = int(current_title.get('Quantity', 0))
+    initial_hash = current_title.get('InitialHash', title_hash)
+    current_hash = current_title.get('CurrentHash', title_hash)
+    current_transfer_count = int(current_title.get('TransferCount', 0))
+
+    # NEW transfer count for the relist record
+    new_transfer_count = current_transfer_count + 1
+
+    # Generate timestamp
+    timestamp = int(datetime.utcnow().timestamp())
+    timestamp_iso = datetime.utcnow().isoformat()
+
+    # Calculate new hash (includes previous hash for chain integrity)
+    hash_input = f"{current_hash}{grain_type}{quantity}{owner_id}{price_string}{timestamp_iso}{new_transfer_count}"
+    new_hash = hashlib.sha256(hash_input.encode()).hexdigest()
+
+    print(f"Hash input: {hash_input}")
+    print(f"New hash: {new_hash}")
+    print(f"Transfer count: {new_transfer_count}")
+
+    # Extend the compact chain (window, digest, length) from the current record
+    chain_fields = link_fields(current_title, new_hash)
+
+    # NEW record with new hash (blockchain style!)
+    new_item = {
+        'TitleHash': new_hash,
+        'InitialHash': initial_hash,
+        'CurrentHash': new_hash,
+        'PreviousHash': current_hash,
+        'GrainType': grain_type,
+        'Quantity': quantity,
+        'Price': Decimal(price_string),
+        'PriceString': price_string,
+        'SellerID': owner_id,
+        'SellerName': owner_name,
+        'SellerSub': owner_sub,
+        'BuyerID': 'NONE',
+        'BuyerName': 'NONE',
+        'BuyerSub': 'NONE',
+        'Status': 'ForSale',
+        'TransferCount': new_transfer_count,
+        'HashTimestamp': timestamp_iso,
+        'Timestamp': timestamp,
+        'TimestampISO': timestamp_iso,
+        'CreatedBy': current_title.get('CreatedBy', owner_id),
+        'CreatedBySub': current_title.get('CreatedBySub', ''),
+        'CreatedByUsername': current_title.get('CreatedByUsername', ''),
+        'RelistedBy': owner_id,
+        'RelistedFrom': title_hash,
+        **chain_fields
+    }
+
+    if ticket_id:
+        new_item['WriteTicket'] = ticket_id
+
+    # Mark the OLD record Purchased, create the new one and move the head together
+    commit(relist_transaction(current_title, new_item, timestamp, timestamp_iso))
+    try_bump_table_version()
+
+    print(f"Created new ForSale record with hash {new_hash}")
+    return new_item
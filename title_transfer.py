@@ -0,0 +1,230 @@
+"""Atomic title transfer.
+
+A transfer marks the ForSale record as Transferred, writes the buyer's new
+record and moves the chain head, all in one TransactWriteItems call:
+
+  1. Update the old record, conditional on Status = ForSale and the
+     CurrentHash the caller read (so a concurrent buyer cannot also win)
+  2. Put the new record, conditional on its TitleHash not existing
+  3. Put the chain head, conditional on it not being past this link
+
+If any condition fails nothing is written and TransferConflict is raised;
+handlers answer 409 without retrying. The listing version is bumped after
+the commit; a failed bump is logged, never raised, since the transfer stands.
+
+commit_transfer_batch() does the same for a cart of titles, several
+transfers per transaction and several transactions in parallel.
+"""
+import hashlib
+from datetime import datetime
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from item_codec import client, serialize_values
+from chain_heads import titles_table, chain_head_put, try_bump_table_version
+from chain_format import link_fields
+
+# Each transfer is 3 of the 100 items a TransactWriteItems call accepts; small
+# groups keep one lost race from holding up many titles
+TRANSFER_GROUP_SIZE = 8
+TRANSFER_GROUP_WORKERS = 4
+
+class TransferConflict(Exception):
+    """The title was bought, relisted or changed since it was read"""
+    def __init__(self, message, reasons=None):
+        super().__init__(message)
+        self.reasons = reasons or []
+
+def transfer_error(current_title, buyer_id):
+    """(status code, message) if buyer_id may not buy current_title, else None"""
+    if current_title.get('Status') != 'ForSale':
+        return 400, 'Title is not available for purchase'
+    # Prevent buying your own title - only check SellerID (email)
+    if buyer_id.lower() == current_title.get('SellerID', '').lower():
+        return 400, 'You cannot purchase your own title'
+    return None
+
+def build_transfer(current_title, buyer_id, buyer_name, buyer_sub):
+    """New record for buyer and the fields to set on the old one"""
+    title_hash = current_title['TitleHash']
+    grain_type = current_title.get('GrainType')
+    quantity = int(current_title.get('Quantity', 0))
+    current_price = float(current_title.get('Price', 0))
+    price_string = current_title.get('PriceString', f"{current_price:.2f}")
+    initial_hash = current_title.get('InitialHash', title_hash)
+    current_hash = current_title.get('CurrentHash', title_hash)
+    current_seller_id = current_title.get('SellerID', '')
+
+    # Get the current transfer count and increment for the new record
+    new_transfer_count = int(current_title.get('TransferCount', 0)) + 1
+
+    # Generate new timestamp
+    timestamp = int(datetime.utcnow().timestamp())
+    timestamp_iso = datetime.utcnow().isoformat()
+
+    # Calculate new hash (includes previous hash for chain integrity)
+    hash_input = f"{current_hash}{grain_type}{quantity}{buyer_id}{price_string}{timestamp_iso}{new_transfer_count}"
+    new_hash = hashlib.sha256(hash_input.encode()).hexdigest()
+
+    print(f"New hash input: {hash_input}")
+    print(f"New hash: {new_hash}")
+    print(f"Transfer count: {new_transfer_count}")
+
+    old_updates = {
+        ':status': 'Transferred',
+        ':buyer_id': buyer_id,
+        ':buyer_name': buyer_name,
+        ':buyer_sub': buyer_sub,
+        ':timestamp': timestamp,
+        ':timestamp_iso': timestamp_iso
+    }
+
+    new_item = {
+        'TitleHash': new_hash,
+        'InitialHash': initial_hash,
+        'CurrentHash': new_hash,
+        'PreviousHash': current_hash,
+        'GrainType': grain_type,
+        'Quantity': quantity,
+        'Price': Decimal(price_string),
+        'PriceString': price_string,
+        'SellerID': buyer_id,  # Buyer becomes new seller/owner
+        'SellerName': buyer_name,
+        'SellerSub': buyer_sub,
+        'BuyerID': 'NONE',
+        'BuyerName': 'NONE',
+        'BuyerSub': 'NONE',
+        'Status': 'Transferred',  # Not for sale until relisted
+        'TransferCount': new_transfer_count,
+        'HashTimestamp': timestamp_iso,
+        'Timestamp': timestamp,
+        'TimestampISO': timestamp_iso,
+        'LastTransferTimestamp': timestamp,
+        'LastTransferTimestampISO': timestamp_iso,
+        'CreatedBy': current_title.get('CreatedBy', current_seller_id),
+        'CreatedBySub': current_title.get('CreatedBySub', ''),
+        'CreatedByUsername': current_title.get('CreatedByUsername', ''),
+        'TransferredBy': current_seller_id,
+        'TransferredTo': buyer_id,
+        **link_fields(current_title, new_hash)
+    }
+    return new_item, old_updates
+
+def transfer_transaction(current_title, new_item, old_updates):
+    """TransactItems committing one transfer"""
+    condition = '#status = :for_sale'
+    values = dict(old_updates, **{':for_sale': 'ForSale'})
+    if 'CurrentHash' in current_title:
+        condition += ' AND CurrentHash = :expected_hash'
+        values[':expected_hash'] = current_title['CurrentHash']
+    return [
+        {
+            'Update': {
+                'TableName': titles_table.name,
+                'Key': serialize_values({'TitleHash': current_title['TitleHash']}),
+                'UpdateExpression': 'SET #status = :status, BuyerID = :buyer_id, BuyerName = :buyer_name, '
+                                    'BuyerSub = :buyer_sub, LastTransferTimestamp = :timestamp, '
+                                    'LastTransferTimestampISO = :timestamp_iso',
+                'ConditionExpression': condition,
+                'ExpressionAttributeNames': {'#status': 'Status'},
+                'ExpressionAttributeValues': serialize_values(values)
+            }
+        },
+        {
+            'Put': {
+                'TableName': titles_table.name,
+                'Item': serialize_values(new_item),
+                'ConditionExpression': 'attribute_not_exists(TitleHash)'
+            }
+        },
+        chain_head_put(new_item)
+    ]
+
+def commit(transact_items):
+    """Run one TransactWriteItems call; conditional failures become TransferConflict"""
+    try:
+        client.transact_write_items(TransactItems=transact_items)
+    except ClientError as e:
+        code = e.response['Error']['Code']
+        if code == 'TransactionCanceledException':
+            reasons = [r.get('Code', 'None') for r in e.response.get('CancellationReasons', [])]
+            if any(r in ('ConditionalCheckFailed', 'TransactionConflict') for r in reasons):
+                raise TransferConflict('Title was purchased or changed by someone else', reasons)
+        elif code == 'TransactionConflictException':
+            raise TransferConflict('Title is being purchased by someone else')
+        raise
+
+def prepare_transfer(current_title, buyer_id, buyer_name, buyer_sub):
+    """(new record, TransactItems) for one transfer, not yet committed"""
+    new_item, old_updates = build_transfer(current_title, buyer_id, buyer_name, buyer_sub)
+    return new_item, transfer_transaction(current_title, new_item, old_updates)
+
+def commit_transfer(current_title, buyer_id, buyer_name, buyer_sub, ticket_id=None):
+    """Transfer current_title to buyer atomically; returns the new record.
+
+    An async write passes its ticket_id, which is stored on the new record
+    as WriteTicket so a redelivered message can find what it wrote.
+    """
+    new_item, old_updates = build_transfer(current_title, buyer_id, buyer_name, buyer_sub)
+    if ticket_id:
+        new_item['WriteTicket'] = ticket_id
+    commit(transfer_transaction(current_title, new_item, old_updates))
+    try_bump_table_version()
+    return new_item
+
+def _commit_group(group):
+    """Commit a group of prepared transfers; returns {title_hash: (new_item, error)}"""
+    try:
+        commit([i for _, _, items in group for i in items])
+        return {title['TitleHash']: (new_item, None) for title, new_item, _ in group}
+    except (TransferConflict, ClientError) as e:
+        if len(group) == 1:
+            return {group[0][0]['TitleHash']: (None, e)}
+    except Exception as e:
+        return {title['TitleHash']: (None, e) for title, _, _ in group}
+
+    # One title in the group lost a race or was refused; settle each on its own so the rest still go through
+    results = {}
+    for title, new_item, items in group:
+        try:
+            commit(items)
+            results[title['TitleHash']] = (new_item, None)
+        except Exception as e:
+            results[title['TitleHash']] = (None, e)
+    return results
+
+def _group_transfers(prepared, group_size):
+    """Split prepared transfers into groups of at most group_size with one title per chain.
+
+    Each transfer puts its chain's GrainChainHeads item, and TransactWriteItems
+    rejects two operations on the same item in one call.
+    """
+    groups = []
+    for transfer in prepared:
+        chain = transfer[1]['InitialHash']
+        for group, chains in groups:
+            if len(group) < group_size and chain not in chains:
+                group.append(transfer)
+                chains.add(chain)
+                break
+        else:
+            groups.append(([transfer], {chain}))
+    return [group for group, _ in groups]
+
+def commit_transfer_batch(titles, buyer_id, buyer_name, buyer_sub,
+                          group_size=TRANSFER_GROUP_SIZE, max_workers=TRANSFER_GROUP_WORKERS):
+    """Transfer several ForSale titles to one buyer.
+
+    Transfers are committed in transactional groups of group_size running in
+    parallel. Returns {title_hash: (new_item, None) or (None, exception)}.
+    """
+    prepared = [(title, *prepare_transfer(title, buyer_id, buyer_name, buyer_sub)) for title in titles]
+    groups = _group_transfers(prepared, group_size)
+    results = {}
+    if groups:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(groups))) as executor:
+            for outcome in executor.map(_commit_group, groups):
+                results.update(outcome)
+    if any(new_item for new_item, _ in results.values()):
+        try_bump_table_version()
+    return results
@@ -0,0 +1,136 @@
+"""Memoized single-record validation results.
+
+Entries are keyed by the hash the caller asked about and record
+fields_digest(), a digest of the hashed fields plus the stored hash. The
+hashed fields should never change after a record is written, but a record
+can still be edited in the table directly, so a verdict is only served
+while the record it was computed from is unchanged.
+
+Two tiers:
+  memory      - per-container LRU keyed by the hash the caller asked about.
+                Entries younger than VALIDATION_CACHE_TTL seconds are served
+                without any read; an edit shows up once they age out.
+  persistent  - GrainValidationCache (partition key TitleHash), or a JSON
+                file when VALIDATION_CACHE_BACKEND=local. Entries do not
+                expire; a hit costs one projected read of the hashed fields,
+                and is only served when their digest still equals the stored
+                FieldsDigest. A CurrentHash or FinalTitleHash the caller
+                pasted gets its own entry (with ResolvedTitleHash and
+                MatchedOn) next to the TitleHash one.
+
+A cache failure is logged and treated as a miss; it never fails validation.
+"""
+import os
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from datetime import datetime
+import boto3
+from botocore.exceptions import ClientError
+from title_hashing import hash_input
+
+VALIDATION_CACHE_BACKEND = os.environ.get('VALIDATION_CACHE_BACKEND', 'dynamodb')
+VALIDATION_CACHE_SIZE = int(os.environ.get('VALIDATION_CACHE_SIZE', '2048'))
+VALIDATION_CACHE_TTL = int(os.environ.get('VALIDATION_CACHE_TTL', '300'))
+VALIDATION_CACHE_PATH = os.environ.get('VALIDATION_CACHE_PATH', '/tmp/grain-validation-cache.json')
+
+def fields_digest(item):
+    """Digest of the hashed fields and the stored hash of a record"""
+    return hashlib.sha256(f"{hash_input(item)}|{item['CurrentHash']}".encode()).hexdigest()
+
+class DynamoStore:
+    def __init__(self, table_name):
+        self.table = boto3.resource('dynamodb').Table(table_name)
+
+    def get(self, title_hash):
+        try:
+            return self.table.get_item(Key={'TitleHash': title_hash}).get('Item')
+        except ClientError as e:
+            print(f"WARNING: validation cache read failed, treating as a miss: {str(e)}")
+            return None
+
+    def put(self, entry):
+        try:
+            self.table.put_item(Item=entry)
+        except ClientError as e:
+            print(f"WARNING: validation cache write failed: {str(e)}")
+
+class LocalStore:
+    """File-backed stand-in for the DynamoDB tier (local runs, tests)"""
+    def __init__(self, path):
+        self.path = path
+        self.entries = None
+
+    def _load(self):
+        if self.entries is None:
+            try:
+                with open(self.path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+        return self.entries
+
+    def get(self, title_hash):
+        return self._load().get(title_hash)
+
+    def put(self, entry):
+        self._load()[entry['TitleHash']] = entry
+        try:
+            with open(self.path, 'w') as f:
+                json.dump(self.entries, f)
+        except OSError as e:
+            print(f"WARNING: validation cache write failed: {str(e)}")
+
+class ValidationCache:
+    def __init__(self, store, max_size=VALIDATION_CACHE_SIZE, ttl=VALIDATION_CACHE_TTL):
+        self.store = store
+        self.max_size = max_size
+        self.ttl = ttl
+        self.recent = OrderedDict()
+
+    def _remember(self, key, entry):
+        self.recent[key] = dict(entry, cached_at=time.monotonic())
+        self.recent.move_to_end(key)
+        while len(self.recent) > self.max_size:
+            self.recent.popitem(last=False)
+
+    def lookup(self, requested_hash, load_fields):
+        """Verdict for a requested hash; (entry, tier) or (None, None).
+
+        load_fields(title_hash) returns the record's hashed fields (or None)
+        and is only called on a persistent hit.
+        """
+        entry = self.recent.get(requested_hash)
+        if entry and time.monotonic() - entry['cached_at'] <= self.ttl:
+            self.recent.move_to_end(requested_hash)
+            return entry, 'memory'
+        entry = self.store.get(requested_hash)
+        if not entry or 'Valid' not in entry:
+            return None, None
+        item = load_fields(entry.get('ResolvedTitleHash', entry['TitleHash']))
+        if not item or fields_digest(item) != entry.get('FieldsDigest'):
+            print(f"Cached verdict for {requested_hash} no longer matches the record; re-validating")
+            return None, None
+        self._remember(requested_hash, dict(entry, MatchedOn=entry.get('MatchedOn', 'TitleHash')))
+        return self.recent[requested_hash], 'persistent'
+
+    def put(self, title_hash, digest, valid, requested_hash=None, matched_on=None):
+        entry = {
+            'TitleHash': title_hash,
+            'FieldsDigest': digest,
+            'Valid': valid,
+            'VerifiedAt': datetime.utcnow().isoformat()
+        }
+        self.store.put(entry)
+        self._remember(title_hash, dict(entry, MatchedOn='TitleHash'))
+        if requested_hash and requested_hash != title_hash:
+            alias = dict(entry, TitleHash=requested_hash, ResolvedTitleHash=title_hash, MatchedOn=matched_on)
+            self.store.put(alias)
+            self._remember(requested_hash, alias)
+        return entry
+
+def make_cache():
+    if VALIDATION_CACHE_BACKEND == 'local':
+        return ValidationCache(LocalStore(VALIDATION_CACHE_PATH))
+    return ValidationCache(DynamoStore(os.environ.get('VALIDATION_CACHE_TABLE', 'GrainValidationCache')))
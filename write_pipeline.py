@@ -0,0 +1,216 @@
+"""Asynchronous, per-chain ordered writes for transfers and relists.
+
+In async mode a handler validates the request, stores a ticket and enqueues
+the write intent instead of applying it, then answers 202 with the ticket.
+grainApp-write-worker.py applies the intents:
+
+  - the queue is SQS FIFO with MessageGroupId = InitialHash, so writes to
+    one chain are applied strictly in order while other chains proceed
+  - a delivered batch is split by chain; chains run in parallel, each
+    chain's messages one after another
+  - a write the data no longer allows (title sold, not yours, lost race)
+    settles its ticket as REJECTED and is not retried; any other error is
+    recorded on the ticket and the message, plus every later message of
+    the same chain in the batch, is handed back to SQS for redelivery
+  - once a write has committed its message is never handed back, even if
+    marking the ticket APPLIED fails; that is retried briefly and logged.
+    A message redelivered anyway (e.g. the worker died before answering)
+    finds the link it already wrote, stamped with its WriteTicket, and
+    settles APPLIED rather than REJECTED
+  - if sending the intent fails, the ticket is settled FAILED and the
+    handler answers 500; nothing was written
+
+grainApp-write-status.py resolves a ticket. Tickets live in
+GrainWriteTickets (partition key TicketId, string; TTL on ExpiresAt).
+
+Set WRITE_QUEUE_URL to the FIFO queue. WRITE_PIPELINE_BACKEND=local sends
+intents to an in-process LocalQueue that grainApp-write-worker.drain_local()
+consumes, for local runs and tests only. With neither set, async mode is
+unavailable and handlers refuse it with 503 rather than queue writes that
+no worker would ever see.
+"""
+import os
+import json
+import time
+import uuid
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import boto3
+
+WRITE_QUEUE_URL = os.environ.get('WRITE_QUEUE_URL', '')
+WRITE_PIPELINE_BACKEND = os.environ.get('WRITE_PIPELINE_BACKEND', 'sqs' if WRITE_QUEUE_URL else '')
+TICKET_TTL = int(os.environ.get('WRITE_TICKET_TTL', str(7 * 86400)))
+CHAIN_WORKERS = 10
+SETTLE_ATTEMPTS = 3
+SETTLE_BACKOFF = 0.1
+
+tickets_table = boto3.resource('dynamodb').Table(os.environ.get('WRITE_TICKETS_TABLE', 'GrainWriteTickets'))
+
+# FAILED: the intent never reached the queue
+FINAL_STATUSES = ('APPLIED', 'REJECTED', 'FAILED')
+
+class WriteRejected(Exception):
+    """The intent can no longer be applied; settles the ticket without a retry"""
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+class LocalQueue:
+    """In-process stand-in for the FIFO queue (send_message/receive only)"""
+    def __init__(self):
+        self.messages = deque()
+
+    def send_message(self, QueueUrl, MessageBody, MessageGroupId, MessageDeduplicationId):
+        self.messages.append({
+            'messageId': MessageDeduplicationId,
+            'body': MessageBody,
+            'attributes': {'MessageGroupId': MessageGroupId}
+        })
+        return {'MessageId': MessageDeduplicationId}
+
+    def receive(self, max_messages=10):
+        """Pop up to max_messages as SQS event records"""
+        records = []
+        while self.messages and len(records) < max_messages:
+            records.append(self.messages.popleft())
+        return records
+
+    def requeue(self, records):
+        # Failed records go back to the front, in order, like an unexpired FIFO group
+        self.messages.extendleft(reversed(records))
+
+local_queue = LocalQueue()
+if WRITE_PIPELINE_BACKEND == 'sqs' and WRITE_QUEUE_URL:
+    queue = boto3.client('sqs')
+elif WRITE_PIPELINE_BACKEND == 'local':
+    queue = local_queue
+else:
+    queue = None
+
+def async_available():
+    """True when enqueued intents will reach a worker"""
+    return queue is not None
+
+def wants_async(event, body):
+    """Async if asked for with "async": true, ?mode=async or Prefer: respond-async"""
+    if body.get('async') in (True, 'true', '1', 1):
+        return True
+    if ((event.get('queryStringParameters') or {}).get('mode') or '').lower() == 'async':
+        return True
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == 'prefer' and 'respond-async' in (value or '').lower():
+            return True
+    return False
+
+def enqueue(kind, initial_hash, title_hash, requested_by, payload):
+    """Store a QUEUED ticket and send the intent; returns the ticket id"""
+    if queue is None:
+        raise RuntimeError('No write queue configured; set WRITE_QUEUE_URL')
+    ticket_id = str(uuid.uuid4())
+    now = datetime.utcnow().isoformat()
+    tickets_table.put_item(Item={
+        'TicketId': ticket_id,
+        'Kind': kind,
+        'Status': 'QUEUED',
+        'InitialHash': initial_hash,
+        'TitleHash': title_hash,
+        'RequestedBy': requested_by,
+        'Attempts': 0,
+        'CreatedAt': now,
+        'UpdatedAt': now,
+        'ExpiresAt': int(time.time()) + TICKET_TTL
+    })
+    try:
+        queue.send_message(
+            QueueUrl=WRITE_QUEUE_URL,
+            MessageBody=json.dumps({'ticket_id': ticket_id, 'kind': kind, 'payload': payload}),
+            MessageGroupId=initial_hash,
+            MessageDeduplicationId=ticket_id
+        )
+    except Exception as e:
+        # No worker will ever see this ticket; settle it so /write-status does not show it QUEUED
+        try:
+            settle_ticket(ticket_id, 'FAILED', error=f'Could not enqueue: {str(e)}', status_code=500)
+        except Exception as settle_error:
+            print(f"WARNING: could not mark unsent ticket {ticket_id} FAILED: {str(settle_error)}")
+        raise
+    print(f"Queued {kind} of {title_hash} on chain {initial_hash} as ticket {ticket_id}")
+    return ticket_id
+
+def get_ticket(ticket_id):
+    return tickets_table.get_item(Key={'TicketId': ticket_id}, ConsistentRead=True).get('Item')
+
+def settle_ticket(ticket_id, status, result=None, error=None, status_code=None):
+    sets = ['#status = :status', 'UpdatedAt = :now']
+    names = {'#status': 'Status'}
+    values = {':status': status, ':now': datetime.utcnow().isoformat(), ':one': 1}
+    if result is not None:
+        sets.append('#result = :result')
+        names['#result'] = 'Result'
+        values[':result'] = result
+    if error is not None:
+        sets.append('LastError = :error')
+        values[':error'] = error
+    if status_code is not None:
+        sets.append('StatusCode = :code')
+        values[':code'] = status_code
+    tickets_table.update_item(
+        Key={'TicketId': ticket_id},
+        UpdateExpression=f"SET {', '.join(sets)} ADD Attempts :one",
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values
+    )
+
+def _settle_applied(ticket_id, result):
+    """Record an applied write; never hands the message back, since the write has committed"""
+    for attempt in range(SETTLE_ATTEMPTS):
+        try:
+            settle_ticket(ticket_id, 'APPLIED', result=result, status_code=200)
+            return
+        except Exception as e:
+            print(f"WARNING: ticket {ticket_id} applied but not settled (attempt {attempt + 1}): {str(e)}")
+            time.sleep(SETTLE_BACKOFF * 2 ** attempt)
+    print(f"ERROR: ticket {ticket_id} was applied with result {json.dumps(result)} but could not be marked APPLIED")
+
+def _process_chain(records, apply):
+    """Apply one chain's records in order; returns the ids SQS should redeliver"""
+    for position, record in enumerate(records):
+        message = json.loads(record['body'])
+        ticket_id = message['ticket_id']
+        try:
+            ticket = get_ticket(ticket_id)
+            if ticket and ticket.get('Status') in FINAL_STATUSES:
+                # Redelivered after it was already settled
+                continue
+            try:
+                result = apply(message['kind'], message['payload'], ticket_id)
+            except WriteRejected as e:
+                # Nothing was written, so a failure to settle can safely be redelivered
+                print(f"Ticket {ticket_id} rejected: {e}")
+                settle_ticket(ticket_id, 'REJECTED', error=str(e), status_code=e.status_code)
+                continue
+        except Exception as e:
+            print(f"ERROR applying ticket {ticket_id}: {str(e)}")
+            try:
+                settle_ticket(ticket_id, 'QUEUED', error=str(e))
+            except Exception as settle_error:
+                print(f"WARNING: could not record the error on ticket {ticket_id}: {str(settle_error)}")
+            # Later writes to this chain must wait for this one
+            return [r['messageId'] for r in records[position:]]
+        # Settled outside the try above: the write has committed and must not be retried
+        _settle_applied(ticket_id, result)
+    return []
+
+def process_records(records, apply, max_workers=CHAIN_WORKERS):
+    """Apply a batch of queue records with apply(kind, payload, ticket_id); returns failed message ids"""
+    chains = OrderedDict()
+    for record in records:
+        chains.setdefault(record['attributes']['MessageGroupId'], []).append(record)
+    failed = []
+    if chains:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chains))) as executor:
+            for chain_failed in executor.map(lambda chain: _process_chain(chain, apply), chains.values()):
+                failed.extend(chain_failed)
+    print(f"Processed {len(records)} writes across {len(chains)} chains, {len(failed)} to retry")
+    return failed